@@ -0,0 +1,240 @@
+"""
+Benchmark suite for the simulation core and the dashboard's figure building.
+Runs without the web server; from the repository root:
+
+    python -m benchmarks.run_benchmarks [--quick] [--output FILE] [--compare BASELINE]
+
+Results are written as JSON (one record per measurement with its group, name,
+parameters and metrics), and --compare prints the change of every metric
+against an earlier results file.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+import numpy as np
+import plotly
+from src.physics.equations import (FORCE_ENGINES, pairwise_acceleration, n_body_acceleration,
+                                   n_body_derivative)
+from src.physics.threaded import threaded_acceleration, THREADS
+from src.physics.simulation import INTEGRATORS, create_integrator
+from src.data.celestial_bodies import SystemData
+from src.data.systems import list_systems, load_system_arrays
+from src.visualization.dashboard import NBodyDashboard
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+REGRESSION_THRESHOLD = 0.10   # Relative change reported as a regression by --compare
+
+def best_time(func, repeat: int = 3) -> float:
+    """Best wall time of one call in seconds, timeit-style."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+def random_system(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    positions = rng.normal(0.0, 10.0, (n, 3))
+    velocities = rng.normal(0.0, 0.01, (n, 3))
+    masses = rng.uniform(1e20, 1e25, n)
+    return masses, np.concatenate([positions.ravel(), velocities.ravel()])
+
+def record(group: str, name: str, params: dict, **metrics) -> dict:
+    print(f"  {name} {params}: " + ", ".join(f"{key}={value:.4g}" for key, value in metrics.items()))
+    return {'group': group, 'name': name, 'params': params, 'metrics': metrics}
+
+def bench_kernels(sizes):
+    results = []
+    for n in sizes:
+        masses, state = random_system(n)
+        positions = state[:3*n].reshape(n, 3)
+        out = np.empty_like(positions)
+        results.append(record('kernels', 'n_body_acceleration', {'n': n},
+                              time_s=best_time(lambda: n_body_acceleration(positions, masses))))
+        results.append(record('kernels', 'pairwise_acceleration_out', {'n': n},
+                              time_s=best_time(lambda: pairwise_acceleration(positions, masses, out=out))))
+        results.append(record('kernels', 'threaded_acceleration_out', {'n': n, 'threads': THREADS},
+                              time_s=best_time(lambda: threaded_acceleration(positions, masses, out=out))))
+        results.append(record('kernels', 'n_body_derivative', {'n': n},
+                              time_s=best_time(lambda: n_body_derivative(0.0, state, masses))))
+    return results
+
+def bench_integrators(system_name: str, dt: float, n_steps: int):
+    # A counting engine through the registry sees every force evaluation of
+    # the integrators that go through func or acceleration; those with their
+    # own force sum keep the direct engine and count in n_force_evaluations
+    calls = [0]
+    def counted(positions, masses, out=None):
+        calls[0] += 1
+        return pairwise_acceleration(positions, masses, out=out)
+
+    system = SystemData(system_name)
+    masses, n = system.get_masses(), len(system.bodies)
+    results = []
+    FORCE_ENGINES['counted'] = counted
+    try:
+        for method in INTEGRATORS:
+            engine = 'counted' if INTEGRATORS[method].uses_engine else 'direct'
+            integrator = create_integrator(method, masses, dt, engine=engine)
+            state = integrator.step(0.0, system.get_initial_state().copy())   # Warm caches and history
+            calls[0] = 0
+            body_evaluations = getattr(integrator, 'n_force_evaluations', 0)
+
+            start = timeit.default_timer()
+            for i in range(1, n_steps + 1):
+                state = integrator.step(i*dt, state)
+            elapsed = timeit.default_timer() - start
+
+            # Hermite and Wisdom-Holman count per-body evaluations themselves
+            body_evaluations = getattr(integrator, 'n_force_evaluations', 0) - body_evaluations
+            evaluations = calls[0] + body_evaluations / n
+            results.append(record('integrators', method, {'system': system_name, 'dt': dt, 'steps': n_steps},
+                                  steps_per_second=n_steps / elapsed,
+                                  force_evaluations_per_step=evaluations / n_steps))
+    finally:
+        del FORCE_ENGINES['counted']
+    return results
+
+def bench_loaders(catalog_sizes):
+    results = []
+    for name in list_systems():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            load_system_arrays(name, cache_dir=cache_dir)
+            cold = best_time(lambda: load_system_arrays(name, cache_dir=tempfile.mkdtemp(dir=cache_dir)))
+            warm = best_time(lambda: load_system_arrays(name, cache_dir=cache_dir))
+        results.append(record('loaders', 'registry', {'system': name}, parse_s=cold, cached_s=warm))
+        results.append(record('loaders', 'SystemData', {'system': name},
+                              time_s=best_time(lambda: SystemData(name))))
+
+    for n in catalog_sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            masses, state = random_system(n)
+            columns = np.column_stack([masses, state[:3*n].reshape(n, 3), state[3*n:].reshape(n, 3)])
+            with open(os.path.join(directory, 'catalog.csv'), 'w') as file:
+                file.write('name,mass,x,y,z,vx,vy,vz\n')
+                for i, row in enumerate(columns):
+                    file.write(f'B{i},' + ','.join(repr(float(value)) for value in row) + '\n')
+            with open(os.path.join(directory, 'catalog.json'), 'w') as file:
+                json.dump({'name': 'catalog', 'format': 'csv', 'source': 'catalog.csv'}, file)
+
+            cache_dir = os.path.join(directory, 'cache')
+            start = timeit.default_timer()
+            load_system_arrays('catalog', directory, cache_dir)
+            cold = timeit.default_timer() - start
+            warm = best_time(lambda: load_system_arrays('catalog', directory, cache_dir))
+        results.append(record('loaders', 'csv_catalog', {'n': n}, parse_s=cold, cached_s=warm))
+    return results
+
+def _patch_json(patch) -> str:
+    return json.dumps(patch.to_plotly_json(), cls=plotly.utils.PlotlyJSONEncoder)
+
+def bench_figures(system_name: str, sim_days: int):
+    dashboard = NBodyDashboard()
+    _, states = dashboard.run_simulation(system_name, 'verlet', sim_days, 1.0)
+    names = dashboard.system.names
+    frame = len(states) // 2
+    params = {'system': system_name, 'frames': len(states)}
+
+    results = []
+    for view_type in ('3d', '2d'):
+        p = dict(params, view=view_type)
+        fig = dashboard.create_figure(states, system_name, view_type)
+        results.append(record('figures', 'create_figure', p,
+                              time_s=best_time(lambda: dashboard.create_figure(states, system_name, view_type)),
+                              payload_bytes=len(fig.to_json())))
+
+        fig = dashboard.create_animation_frame(states, names, frame, view_type)
+        results.append(record('figures', 'create_animation_frame', p,
+                              time_s=best_time(lambda: dashboard.create_animation_frame(states, names, frame, view_type)),
+                              payload_bytes=len(fig.to_json())))
+
+        fig = dashboard.create_animation_figure(states, names, frame, view_type)
+        results.append(record('figures', 'create_animation_figure', p,
+                              time_s=best_time(lambda: dashboard.create_animation_figure(states, names, frame, view_type)),
+                              payload_bytes=len(json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder))))
+
+        patch = dashboard.create_animation_patch(states, names, frame + 1, view_type, frame)
+        results.append(record('figures', 'create_animation_patch', p,
+                              time_s=best_time(lambda: dashboard.create_animation_patch(states, names, frame + 1,
+                                                                                        view_type, frame)),
+                              payload_bytes=len(_patch_json(patch))))
+    return results
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+
+def compare(results: list, baseline: list):
+    """Print the relative change of every metric present in both runs."""
+    def key(entry):
+        return entry['group'], entry['name'], json.dumps(entry['params'], sort_keys=True)
+    previous = {key(entry): entry['metrics'] for entry in baseline}
+
+    print(f"\n{'benchmark':<75} {'metric':<28} {'change':>8}")
+    for entry in results:
+        old = previous.get(key(entry))
+        if old is None:
+            continue
+        for metric, value in entry['metrics'].items():
+            if not old.get(metric):
+                continue
+            change = value / old[metric] - 1
+            # Rates are better when higher, times and sizes when lower
+            worse = -change if metric.endswith('per_second') else change
+            flag = '  REGRESSION' if worse > REGRESSION_THRESHOLD else ''
+            params = ' '.join(f'{name}={value}' for name, value in entry['params'].items())
+            label = f"{entry['group']}/{entry['name']} {params}"
+            print(f"{label:<75} {metric:<28} {change:>+8.1%}{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the N-body benchmark suite.")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes for a fast smoke run")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    kernel_sizes = [2, 10, 100, 1000] if args.quick else [2, 10, 100, 1000, 10000]
+    catalog_sizes = [1000] if args.quick else [1000, 10000, 100000]
+    steps = 100 if args.quick else 365
+    sim_days = 3650 if args.quick else 36500
+
+    results = []
+    for title, run in [
+        ("Force kernels", lambda: bench_kernels(kernel_sizes)),
+        ("Integrators", lambda: bench_integrators('solar system', 1.0, steps)),
+        ("Loaders", lambda: bench_loaders(catalog_sizes)),
+        ("Figures", lambda: bench_figures('solar system', sim_days)),
+    ]:
+        print(title)
+        results += run()
+
+    env = environment()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"benchmark-{env['timestamp'].replace(':', '').replace('+0000', 'Z')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({'environment': env, 'results': results}, file, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file)['results'])
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
 from src.visualization.dashboard import NBodyDashboard
+from src.utils import metrics
 
 def main():
+    # Export metrics from this server's processes, dropping those of earlier runs
+    metrics.start_export(clear=True)
+    
     # Create the dashboard
     dashboard = NBodyDashboard()
     
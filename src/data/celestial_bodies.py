@@ -1,6 +1,8 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Iterator, List
 import numpy as np
+from .systems import get_system, load_system_arrays
+from ..utils import metrics
 
 @dataclass
 class CelestialBody:
@@ -9,73 +11,103 @@ class CelestialBody:
     position: np.ndarray
     velocity: np.ndarray
 
+class BodyTable:
+    """
+    Structure-of-arrays table of bodies. state is one contiguous vector
+    [positions, velocities] of shape (6*n,), the layout the integrators use;
+    positions and velocities are (n, 3) views of it and masses is (n,).
+    Bodies of zero mass are test particles: they feel gravity but exert none.
+    Indexing or iterating gives CelestialBody records whose position and
+    velocity are views into the table.
+    """
+    def __init__(self, names: List[str], masses: np.ndarray, positions: np.ndarray,
+                 velocities: np.ndarray):
+        n = len(names)
+        self.names = list(names)
+        self.masses = np.array(masses, dtype=float)
+        self.state = np.empty(6 * n)
+        halves = self.state.reshape(2, n, 3)
+        self.positions, self.velocities = halves[0], halves[1]
+        self.positions[...] = positions
+        self.velocities[...] = velocities
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    @property
+    def test_particles(self) -> np.ndarray:
+        """Boolean mask of the massless bodies, shape (n,)"""
+        return self.masses == 0
+    
+    def __getitem__(self, i: int) -> CelestialBody:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"body index {i} out of range")
+        return CelestialBody(name=self.names[i], mass=float(self.masses[i]),
+                             position=self.positions[i], velocity=self.velocities[i])
+    
+    def __iter__(self) -> Iterator[CelestialBody]:
+        return (self[i] for i in range(len(self)))
+
 class SystemData:
     def __init__(self, system_name: str):
         """Initialize system from data file"""
         self.system_name = system_name
-        self.bodies = []
+        self.meta = get_system(system_name)
+        self.path = self.meta['source']
         self._load_system()
     
+    @staticmethod
+    def data_path(system_name: str) -> str:
+        """Path of a system's data file"""
+        return get_system(system_name)['source']
+    
+    @staticmethod
+    def key_options(system_name: str) -> dict:
+        """Metadata beyond the data file that changes a system's runs, for cache_key and family_key"""
+        test_particles = get_system(system_name).get('test_particles')
+        return {'test_particles': sorted(test_particles)} if test_particles else {}
+    
+    @metrics.timed('nbody_system_load_seconds')
     def _load_system(self):
-        """Load system data from file"""
-        with open(f'data/{self.system_name}_values.txt', 'r') as file:
-            lines = [line.strip() for line in file.readlines()]
-            
-            # Determine system bodies
-            if self.system_name == 'Voyager 2':
-                names = ['Voyager 2', 'Sun', 'Earth', 'Saturn', 'Jupiter']
-            elif self.system_name == 'solar system':
-                names = ['Sun', 'Mercury', 'Venus', 'Earth', 'Mars', 
-                        'Jupiter', 'Saturn', 'Uranus', 'Neptun', 'Moon', 'Ceres']
-            elif self.system_name == 'halley':
-                names = ['Halley comet', 'Sun']
-            elif self.system_name == 'Voyager 1':
-                names = ['Voyager 1', 'Sun', 'Earth', 'Saturn', 'Jupiter']
-            
-            n = len(names)
-            
-            # Read masses
-            masses = []
-            for i in range(n):
-                masses.append(float(lines[i]))
-            
-            # Initialize state array
-            T = np.zeros((6 * n))
-            
-            # Read positions and velocities
-            for i in range(n, 6 * n + n):
-                T[i - n] = float(lines[i])
-            
-            # Create bodies
-            for i in range(n):
-                pos = np.array([
-                    T[6*i + 3],
-                    T[6*i + 4],
-                    T[6*i + 5]
-                ])
-                vel = np.array([
-                    T[6*i],
-                    T[6*i + 1],
-                    T[6*i + 2]
-                ])
-                
-                self.bodies.append(CelestialBody(
-                    name=names[i],
-                    mass=masses[i],
-                    position=pos,
-                    velocity=vel
-                ))
+        """Load system data through the system registry"""
+        names, masses, positions, velocities = load_system_arrays(self.system_name)
+        # Bodies designated as test particles in the metadata are massless
+        test_particles = self.meta.get('test_particles', [])
+        unknown = set(test_particles) - set(names)
+        if unknown:
+            raise ValueError(f"Test particles {sorted(unknown)} are not bodies of '{self.system_name}'")
+        masses = np.where(np.isin(names, test_particles), 0.0, masses)
+        self.table = BodyTable(names, masses, positions, velocities)
+    
+    @property
+    def bodies(self) -> BodyTable:
+        """Per-body CelestialBody records (views into the body table)"""
+        return self.table
+    
+    @property
+    def names(self) -> List[str]:
+        return self.table.names
     
     def get_initial_state(self) -> np.ndarray:
-        """Returns initial state vector [positions, velocities]"""
-        state = np.zeros(6 * len(self.bodies))
-        for i, body in enumerate(self.bodies):
-            # Positions
-            state[3*i:3*i + 3] = body.position
-            # Velocities
-            state[3*len(self.bodies) + 3*i:3*len(self.bodies) + 3*i + 3] = body.velocity
-        return state
+        """
+        Returns initial state vector [positions, velocities]. This is the body
+        table's own storage, not a copy: copy it before modifying it.
+        """
+        return self.table.state
     
     def get_masses(self) -> np.ndarray:
-        """Returns array of masses"""
-        return np.array([body.mass for body in self.bodies]) 
\ No newline at end of file
+        """Returns array of masses (the body table's own storage)"""
+        return self.table.masses
+    
+    def sample_initial_states(self, n_members: int, position_sigma: float = 0.0,
+                              velocity_sigma: float = 0.0, seed: int = None) -> np.ndarray:
+        """
+        Returns an ensemble of initial states, shape (n_members, 6*n), with
+        Gaussian perturbations of the given sigma (AU, AU/day) on every body.
+        """
+        n = len(self.table)
+        rng = np.random.default_rng(seed)
+        states = np.tile(self.get_initial_state(), (n_members, 1))
+        states[:, :3*n] += rng.normal(0.0, position_sigma, (n_members, 3*n))
+        states[:, 3*n:] += rng.normal(0.0, velocity_sigma, (n_members, 3*n))
+        return states
@@ -0,0 +1,251 @@
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .celestial_bodies import SystemData
+from .trajectory_store import TrajectoryWriter, TrajectoryReader
+from .run_store import RunStore, family_key, STALE_AFTER
+from ..physics.simulation import create_integrator, simulate, total_steps
+from ..utils import metrics
+
+JOB_WORKERS = int(os.environ.get('NBODY_JOB_WORKERS', 2))
+PROGRESS_INTERVAL = 0.5   # Seconds between progress updates of a running job
+CHECKPOINT_INTERVAL = 30  # Seconds between checkpoints of a running job
+FINISHED_KEPT = 3600      # Seconds the record of a failed or cancelled job stays readable
+FINISHED = ('done', 'cancelled', 'error')
+
+# Job state lives next to the runs, so any server worker can report on or
+# cancel a job started by another one:
+#
+#     <run_id>.job                 JSON {status, done, total, partial, resumed_from, error, stats}
+#     <run_id>.cancel              present once cancellation was requested
+#     <partial>                    trajectory written so far, readable while running
+#     <partial>.ckpt               checkpoint of the last state written to it
+#
+# A partial left by a dead job stays as long as RunStore.evict() keeps it, so
+# the next job of its run family resumes from its checkpoint.
+# status goes queued -> running -> done | cancelled | error. The .job file is
+# created exclusively, so only one worker runs a given run ID at a time.
+
+def _job_path(directory: str, run_id: str) -> str:
+    return os.path.join(directory, f'{run_id}.job')
+
+def _cancel_path(directory: str, run_id: str) -> str:
+    return os.path.join(directory, f'{run_id}.cancel')
+
+def _write_status(directory: str, run_id: str, status: dict):
+    path = _job_path(directory, run_id)
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'w') as file:
+        json.dump(status, file)
+    os.replace(temp, path)
+
+def run_job(directory: str, run_id: str, partial: str, system_name: str, method: str,
+            sim_time: float, step: float):
+    """
+    Process pool entry point: integrate a run into its partial file, then
+    publish it. The run resumes from the latest checkpoint of its family
+    (same system data, method and step) when there is one, and checkpoints
+    itself periodically so a run interrupted by a worker restart resumes too.
+    """
+    store = RunStore(directory)
+    status = {'status': 'running', 'done': 0, 'total': None, 'partial': os.path.basename(partial)}
+    last_update = 0.0
+    last_step = 0
+
+    def progress(steps_done, total_steps, t, state):
+        nonlocal last_update, last_step
+        last_step = steps_done
+        now = time.monotonic()
+        if now - last_update < PROGRESS_INTERVAL and steps_done < total_steps:
+            return True
+        last_update = now
+        if os.path.exists(_cancel_path(directory, run_id)):
+            return False
+        status.update(done=steps_done, total=total_steps)
+        _write_status(directory, run_id, status)
+        return True
+
+    try:
+        system = SystemData(system_name)
+        integrator = create_integrator(method, system.get_masses(), step)
+        family = family_key(system.path, method, step, **SystemData.key_options(system_name))
+        state, start_step = system.get_initial_state(), 0
+
+        checkpoint = store.find_checkpoint(family, total_steps(sim_time, step))
+        if checkpoint is not None:
+            shutil.copyfile(checkpoint['trajectory'], partial)
+            writer = TrajectoryWriter.reopen(partial, checkpoint['n_frames'])
+            integrator.set_state(checkpoint['integrator'])
+            state, start_step = checkpoint['state'], checkpoint['step']
+            status['resumed_from'] = start_step
+        else:
+            writer = TrajectoryWriter.for_system(partial, system, method, step)
+
+        last_checkpoint = time.monotonic()
+        with writer:
+            for times, states in simulate(integrator, state, sim_time, callback=progress,
+                                          start_step=start_step):
+                writer.append(times, states)
+                t, state = times[-1], states[-1]
+                # The integrator is suspended right after the step of the chunk's last sample
+                if time.monotonic() - last_checkpoint > CHECKPOINT_INTERVAL:
+                    writer.flush()
+                    store.save_checkpoint(partial, family, last_step, writer.n_frames, t, state,
+                                          integrator.get_state())
+                    last_checkpoint = time.monotonic()
+            writer.flush()
+            if last_step > start_step:
+                store.save_checkpoint(partial, family, last_step, writer.n_frames, t, state,
+                                      integrator.get_state())
+    except Exception as e:
+        store.discard(partial)
+        status.update(status='error', error=str(e))
+        _write_status(directory, run_id, status)
+        return
+
+    if os.path.exists(_cancel_path(directory, run_id)):
+        store.discard(partial)
+        os.remove(_cancel_path(directory, run_id))
+        status['status'] = 'cancelled'
+    else:
+        store.publish(run_id, partial)
+        store.evict()
+        status.update(status='done', done=status['total'], stats={
+            name: getattr(integrator, name)
+            for name in ('n_accepted', 'n_rejected', 'n_force_evaluations', 'n_evaluations')
+            if hasattr(integrator, name)
+        })
+    _write_status(directory, run_id, status)
+
+class JobManager:
+    """
+    Runs simulations on a local process pool so web workers return at once.
+    Jobs are identified by the run ID they produce and report progress as
+    steps done out of the total; a running job's partial trajectory can be
+    read with open_partial().
+    """
+    def __init__(self, store: RunStore, max_workers: int = JOB_WORKERS):
+        self.store = store
+        self.max_workers = max_workers
+        self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Created on first use, after the server has forked its workers
+        if self._pool is None:
+            # Job processes report metrics only when the server exports them
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=metrics.start_export if metrics.exporting() else None)
+        return self._pool
+
+    def status(self, run_id: str) -> dict:
+        """Last reported state of a job, or None if there is none."""
+        try:
+            with open(_job_path(self.store.directory, run_id)) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _claim(self, run_id: str) -> bool:
+        path = _job_path(self.store.directory, run_id)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                status = self.status(run_id)
+                try:
+                    stale = time.time() - os.path.getmtime(path) > STALE_AFTER
+                except FileNotFoundError:
+                    continue
+                # An unreadable record is one being created right now
+                if (status is None or status['status'] not in FINISHED) and not stale:
+                    return False
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def submit(self, run_id: str, system_name: str, method: str, sim_time: float, step: float) -> str:
+        """Start a job for run_id unless one is already queued or running; returns run_id."""
+        if not self._claim(run_id):
+            return run_id
+        try:
+            os.remove(_cancel_path(self.store.directory, run_id))
+        except FileNotFoundError:
+            pass
+
+        partial = self.store.partial_path(run_id)
+        status = {'status': 'queued', 'done': 0, 'total': None, 'partial': os.path.basename(partial)}
+        _write_status(self.store.directory, run_id, status)
+        self.prune()
+        future = error = None
+        for attempt in range(2):
+            try:
+                pool = self._executor()
+                future = pool.submit(run_job, self.store.directory, run_id, partial,
+                                     system_name, method, sim_time, step)
+                break
+            except BrokenProcessPool as e:
+                # A job process died (e.g. killed for memory): later jobs get a fresh pool
+                self._pool = None
+                error = e
+            except RuntimeError as e:
+                error = e
+                break
+        if future is None:
+            status.update(status='error', error=f"Could not start the simulation: {error}")
+            _write_status(self.store.directory, run_id, status)
+            return run_id
+        future.add_done_callback(lambda future: self._lost(run_id, partial, pool, future))
+        return run_id
+
+    def _lost(self, run_id: str, partial: str, pool: ProcessPoolExecutor, future):
+        # run_job reports its own outcome; an exception here means its process died
+        if future.cancelled() or future.exception() is None:
+            return
+        status = self.status(run_id)
+        if status is None or status['status'] not in FINISHED:
+            self.store.discard(partial)
+            _write_status(self.store.directory, run_id, dict(status or {}, status='error',
+                                                             error=f"Simulation process failed: {future.exception()}"))
+        if isinstance(future.exception(), BrokenProcessPool) and self._pool is pool:
+            self._pool = None
+
+    def prune(self):
+        """Remove the records of jobs that failed or were cancelled over FINISHED_KEPT seconds ago."""
+        now = time.time()
+        for entry in os.scandir(self.store.directory):
+            if not entry.name.endswith(('.job', '.cancel')):
+                continue
+            run_id = entry.name.rsplit('.', 1)[0]
+            try:
+                if os.path.exists(self.store.path(run_id)) or now - entry.stat().st_mtime < FINISHED_KEPT:
+                    continue   # Records of stored runs go with them in RunStore.evict()
+                status = self.status(run_id)
+                # A cancel flag outlives its job only if the job never picked it up
+                if (status is None and entry.name.endswith('.cancel')) or \
+                        (status is not None and status['status'] in FINISHED):
+                    os.remove(entry.path)
+            except (FileNotFoundError, ValueError):
+                pass   # Pruned by another worker, or not a job file
+
+    def cancel(self, run_id: str):
+        """Ask a queued or running job to stop; it discards its partial run."""
+        status = self.status(run_id)
+        if status is not None and status['status'] not in FINISHED:
+            open(_cancel_path(self.store.directory, run_id), 'w').close()
+
+    def open_partial(self, run_id: str):
+        """Reader of the frames a running job has written so far, or None."""
+        status = self.status(run_id)
+        if status is None or status['status'] in FINISHED:
+            return None
+        try:
+            return TrajectoryReader(os.path.join(self.store.directory, status['partial']))
+        except (FileNotFoundError, ValueError):
+            return None
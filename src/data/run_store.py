@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+from .trajectory_store import TrajectoryReader
+
+RUN_DIR = os.environ.get('NBODY_RUN_DIR', os.path.join(tempfile.gettempdir(), 'nbody-runs'))
+MAX_RUNS = int(os.environ.get('NBODY_MAX_RUNS', 64))
+MAX_BYTES = int(os.environ.get('NBODY_MAX_BYTES', 2 * 1024**3))
+MAX_OPEN = 16   # Memory-mapped readers kept open per process
+STALE_AFTER = 300  # Seconds without a job record update after which a job counts as dead
+KEY_VERSION = 1  # Bump when a change alters results for the same inputs
+
+def _digest(data_path: str, params: dict) -> str:
+    digest = hashlib.sha256()
+    with open(data_path, 'rb') as file:
+        digest.update(file.read())
+    digest.update(json.dumps({'version': KEY_VERSION, **params}, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def cache_key(data_path: str, method: str, sim_time: float, step: float, **options) -> str:
+    """
+    Content address of a run: a hash of the system data file contents and
+    the simulation parameters, so identical requests share one stored run.
+    """
+    return _digest(data_path, {'method': method, 'sim_time': float(sim_time), 'step': float(step), **options})
+
+def family_key(data_path: str, method: str, step: float, **options) -> str:
+    """Like cache_key without sim_time: runs of one family are prefixes of each other."""
+    return _digest(data_path, {'method': method, 'step': float(step), **options})
+
+class RunStore:
+    """
+    Server-side store of simulation runs, one trajectory file per run ID.
+    Files live in a shared directory so every server worker can serve any run.
+    Opening a run marks it as recently used; the least recently used runs are
+    removed once more than max_runs or max_bytes are stored. A run may carry
+    a checkpoint of its final state, from which a longer run of the same
+    family is resumed.
+    """
+    def __init__(self, directory: str = RUN_DIR, max_runs: int = MAX_RUNS, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        self.max_runs = max_runs
+        self.max_bytes = max_bytes
+        self._readers = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def new_run_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def path(self, run_id: str) -> str:
+        if not run_id or not run_id.isalnum():
+            raise ValueError(f"Invalid run ID {run_id!r}")
+        return os.path.join(self.directory, f'{run_id}.traj')
+
+    def partial_path(self, run_id: str) -> str:
+        """Private file a worker writes a run to before publish() makes it visible."""
+        return f'{self.path(run_id)}.{os.getpid()}.{uuid.uuid4().hex[:8]}.part'
+
+    def publish(self, run_id: str, partial_path: str):
+        """Atomically move a finished run into place; a concurrent identical run simply wins or loses the race."""
+        os.replace(partial_path, self.path(run_id))
+        if os.path.exists(partial_path + '.ckpt'):
+            os.replace(partial_path + '.ckpt', self.path(run_id) + '.ckpt')
+
+    def discard(self, partial_path: str):
+        """Remove the file of a run that failed before publish(), and its checkpoint."""
+        for path in (partial_path, partial_path + '.ckpt'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def save_checkpoint(self, trajectory_path: str, family: str, step: int, n_frames: int,
+                        t: float, state: np.ndarray, integrator_state: dict):
+        """
+        Record that the first n_frames frames of a trajectory file end after
+        step steps of a run family, in the given state. integrator_state is an
+        integrator's get_state(). The checkpoint sits next to its trajectory.
+        """
+        path = trajectory_path + '.ckpt'
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'wb') as file:
+            np.savez(file, family=family, step=step, n_frames=n_frames, t=t, state=state,
+                     **{f'integrator.{name}': value for name, value in integrator_state.items()})
+        os.replace(temp, path)
+
+    def find_checkpoint(self, family: str, max_step: int) -> dict:
+        """
+        Latest checkpoint of a run family at or before max_step whose
+        trajectory still exists, as a dict with 'trajectory' (its path), 'step',
+        'n_frames', 't', 'state' and 'integrator' (the get_state() dict); or None.
+        """
+        best = None
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.ckpt'):
+                continue
+            try:
+                with np.load(entry.path) as data:
+                    if str(data['family']) != family or int(data['step']) > max_step:
+                        continue
+                    if best is not None and int(data['step']) <= best['step']:
+                        continue
+                    checkpoint = {
+                        'trajectory': entry.path[:-len('.ckpt')],
+                        'step': int(data['step']),
+                        'n_frames': int(data['n_frames']),
+                        't': float(data['t']),
+                        'state': data['state'],
+                        'integrator': {key[len('integrator.'):]: data[key]
+                                       for key in data.files if key.startswith('integrator.')}
+                    }
+            except (FileNotFoundError, ValueError, OSError, KeyError):
+                continue   # Removed or being replaced by another worker
+            if os.path.exists(checkpoint['trajectory']):
+                best = checkpoint
+        return best
+
+    def open(self, run_id: str) -> TrajectoryReader:
+        """Memory-mapped reader of a stored run, or None if it no longer exists."""
+        try:
+            # Access time for the LRU order, kept in the mtime so it works on noatime mounts
+            os.utime(self.path(run_id))
+        except (FileNotFoundError, ValueError):
+            self._readers.pop(run_id, None)
+            return None
+
+        reader = self._readers.get(run_id)
+        if reader is not None:
+            self._readers.move_to_end(run_id)
+            return reader
+
+        try:
+            reader = TrajectoryReader(self.path(run_id))
+        except (FileNotFoundError, ValueError):
+            return None
+        self._readers[run_id] = reader
+        if len(self._readers) > MAX_OPEN:
+            self._readers.popitem(last=False)
+        return reader
+
+    def _size(self, path: str) -> int:
+        """Bytes of a trajectory file and its checkpoint."""
+        size = 0
+        for name in (path, path + '.ckpt'):
+            try:
+                size += os.path.getsize(name)
+            except FileNotFoundError:
+                pass
+        return size
+
+    def _job_alive(self, partial_path: str, now: float) -> bool:
+        """Whether a partial file belongs to a queued or running job, judged by its job record."""
+        name = os.path.basename(partial_path)
+        record = os.path.join(self.directory, name.split('.', 1)[0] + '.job')
+        try:
+            if now - os.path.getmtime(record) > STALE_AFTER:
+                return False
+            with open(record) as file:
+                status = json.load(file)
+        except FileNotFoundError:
+            return False
+        except ValueError:
+            return True   # Record being claimed right now
+        return status.get('status') in ('queued', 'running') and status.get('partial') == name
+
+    def evict(self):
+        """
+        Remove the least recently used runs beyond max_runs or max_bytes.
+        The partial files of running jobs count towards max_bytes. Those left
+        by dead jobs are evicted like runs while their checkpoint can still
+        resume a run, and removed at once otherwise.
+        """
+        now = time.time()
+        runs, reserved = [], 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.traj'):
+                path = entry.path
+            elif entry.name.endswith(('.part', '.part.ckpt')):
+                path = entry.path[:-len('.ckpt')] if entry.name.endswith('.ckpt') else entry.path
+                if path != entry.path and os.path.exists(path):
+                    continue   # Counted with its partial
+            else:
+                continue
+            try:
+                mtime = os.path.getmtime(path)
+            except FileNotFoundError:
+                mtime = None
+            size = self._size(path)
+            if path.endswith('.part'):
+                if self._job_alive(path, now):
+                    reserved += size
+                    continue
+                if mtime is None or not os.path.exists(path + '.ckpt'):
+                    self.discard(path)
+                    continue
+            elif mtime is None:
+                continue   # Evicted by another worker
+            runs.append((mtime, size, path))
+        runs.sort()
+
+        total = reserved + sum(size for _, size, _ in runs)
+        count = len(runs)
+        for _, size, path in runs[:-1]:   # The newest run is always kept
+            if count <= self.max_runs and total <= self.max_bytes:
+                break
+            # Along with a run goes its job record, if any
+            stale = (path, path + '.ckpt')
+            if path.endswith('.traj'):
+                stale += (path[:-len('.traj')] + '.job',)
+            for name in stale:
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass   # Already evicted by another worker
+            count -= 1
+            total -= size
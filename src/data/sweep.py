@@ -0,0 +1,127 @@
+"""
+Parameter sweeps: every combination of systems, methods, step sizes and
+durations, run on a process pool and collected into one table. From the
+repository root:
+
+    python -m src.data.sweep [--systems NAME ...] [--methods euler rk4 ...]
+                             [--dts 1 0.5 ...] [--durations 365 ...]
+                             [--precisions double mixed] [--output FILE]
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+import numpy as np
+import pandas as pd
+from .celestial_bodies import SystemData
+from .systems import list_systems
+from ..physics.equations import total_energy, total_momentum, angular_momentum
+from ..physics.simulation import create_integrator, simulate, total_steps
+
+SWEEP_WORKERS = int(os.environ.get('NBODY_SWEEP_WORKERS', os.cpu_count() or 1))
+DEFAULT_METHODS = ('euler', 'rk4', 'verlet', 'adams')
+DIAGNOSTIC_SAMPLES = 100   # States per run the conservation errors are checked at
+
+def _relative(value: np.ndarray, reference: np.ndarray, scale: float) -> float:
+    return float(np.linalg.norm(value - reference) / scale) if scale else float('nan')
+
+def run_case(system_name: str, method: str, dt: float, duration: float, precision: str = 'double',
+             engine: str = 'direct') -> dict:
+    """
+    Process pool entry point: integrate one grid point and measure it.
+    Energy errors are relative to the initial energy; momentum errors are
+    relative to the sum of |m v| and |m r x v| of the bodies, since the total
+    momentum of a barycentric system is itself close to zero.
+    """
+    row = {'system': system_name, 'method': method, 'dt': dt, 'duration': duration,
+           'precision': precision, 'steps': total_steps(duration, dt)}
+    try:
+        system = SystemData(system_name)
+        masses, initial_state = system.get_masses(), system.get_initial_state().copy()
+        n = len(masses)
+        energy0 = total_energy(initial_state, masses)
+        momentum0 = total_momentum(initial_state, masses)
+        angular0 = angular_momentum(initial_state, masses)
+        positions, velocities = initial_state[:3*n].reshape(n, 3), initial_state[3*n:].reshape(n, 3)
+        momentum_scale = np.sum(masses * np.linalg.norm(velocities, axis=1))
+        angular_scale = np.sum(masses * np.linalg.norm(np.cross(positions, velocities), axis=1))
+
+        max_energy_error = 0.0
+        def check(steps_done, n_steps, t, state):
+            nonlocal max_energy_error
+            max_energy_error = max(max_energy_error, abs(total_energy(state, masses) / energy0 - 1))
+
+        integrator = create_integrator(method, masses, dt, engine, precision)
+        start = time.perf_counter()
+        for times, states in simulate(integrator, initial_state, duration,
+                                      output_interval=duration / DIAGNOSTIC_SAMPLES, callback=check):
+            final_time, final_state = times[-1], states[-1].copy()
+        row['wall_time_s'] = time.perf_counter() - start
+
+        row.update(
+            final_time=final_time,
+            energy_error=abs(total_energy(final_state, masses) / energy0 - 1),
+            max_energy_error=max_energy_error,
+            momentum_error=_relative(total_momentum(final_state, masses), momentum0, momentum_scale),
+            angular_momentum_error=_relative(angular_momentum(final_state, masses), angular0, angular_scale),
+            final_state=final_state,
+            error=None
+        )
+    except Exception as exc:
+        row['error'] = f'{type(exc).__name__}: {exc}'
+    return row
+
+def run_sweep(systems: Iterable[str] = None, methods: Iterable[str] = DEFAULT_METHODS,
+              dts: Iterable[float] = (1.0,), durations: Iterable[float] = (365.0,),
+              precisions: Iterable[str] = ('double',), engine: str = 'direct',
+              max_workers: int = SWEEP_WORKERS) -> pd.DataFrame:
+    """
+    Run every (system, method, dt, duration, precision) combination on a process pool.
+    systems defaults to every registered system. Returns one row per
+    combination in grid order, with the wall time, final state and
+    conservation errors of the run, or the error message of a failed run.
+    """
+    systems = list_systems() if systems is None else systems
+    grid = list(itertools.product(systems, methods, dts, durations, precisions))
+    # Longest runs first, so the pool never ends waiting on a late long one
+    order = sorted(range(len(grid)), key=lambda i: -total_steps(grid[i][3], grid[i][2]))
+
+    rows = [None] * len(grid)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(grid))), mp_context=context) as pool:
+        futures = {i: pool.submit(run_case, *grid[i], engine) for i in order}
+        for i, future in futures.items():
+            rows[i] = future.result()
+
+    columns = ['system', 'method', 'dt', 'duration', 'precision', 'steps', 'wall_time_s', 'final_time',
+               'energy_error', 'max_energy_error', 'momentum_error', 'angular_momentum_error',
+               'final_state', 'error']
+    return pd.DataFrame(rows, columns=columns)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare integration methods and step sizes.")
+    parser.add_argument('--systems', nargs='+', help="system names (default: all registered systems)")
+    parser.add_argument('--methods', nargs='+', default=list(DEFAULT_METHODS))
+    parser.add_argument('--dts', nargs='+', type=float, default=[1.0], help="step sizes in days")
+    parser.add_argument('--durations', nargs='+', type=float, default=[365.0], help="run lengths in days")
+    parser.add_argument('--precisions', nargs='+', default=['double'], help="double and/or mixed")
+    parser.add_argument('--engine', default='direct', help="force engine")
+    parser.add_argument('--workers', type=int, default=SWEEP_WORKERS, help="worker processes")
+    parser.add_argument('--output', help="write the table to a .csv (without final states) or .pkl file")
+    args = parser.parse_args(argv)
+
+    table = run_sweep(args.systems, args.methods, args.dts, args.durations, args.precisions,
+                      args.engine, args.workers)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.drop(columns='final_state').to_string(index=False))
+    if args.output:
+        if args.output.endswith('.pkl'):
+            table.to_pickle(args.output)
+        else:
+            table.drop(columns='final_state').to_csv(args.output, index=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import json
+import os
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+SYSTEMS_DIR = os.environ.get('NBODY_SYSTEMS_DIR', os.path.join('data', 'systems'))
+CACHE_DIR = os.environ.get('NBODY_SYSTEM_CACHE', os.path.join('data', 'cache'))
+CACHE_VERSION = 1
+
+# Each system is described by a JSON metadata file in SYSTEMS_DIR:
+#
+#     {"name": "solar system", "label": "Solar System", "order": 0,
+#      "format": "values", "source": "../solar system_values.txt",
+#      "bodies": ["Sun", "Mercury", ...]}
+#
+# source is relative to the metadata file. An optional "test_particles" list
+# names bodies that are loaded massless: they move in the field of the
+# massive bodies without acting on them. Formats:
+#     values   one number per line: the n masses, then vx vy vz x y z of
+#              each body; body names come from "bodies"
+#     csv      a header line, then one row per body with the columns
+#              name, mass, x, y, z, vx, vy, vz; a mass of 0 also makes
+#              a test particle
+# The parsed arrays are cached as .npz in CACHE_DIR and rebuilt whenever the
+# metadata or source file changes, so adding a system needs no code change.
+
+# Parsed registries by directory, with the metadata files' (name, mtime, size)
+# they were parsed from
+_registry = {}
+
+def list_systems(directory: str = SYSTEMS_DIR) -> Dict[str, dict]:
+    """
+    Metadata of every registered system by name, in display order. The files
+    are parsed again only when one is added, removed or modified.
+    """
+    entries = sorted((entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+                     key=lambda entry: entry.name)
+    signature = [(entry.name, entry.stat().st_mtime_ns, entry.stat().st_size) for entry in entries]
+    cached = _registry.get(directory)
+    if cached is not None and cached[0] == signature:
+        return dict(cached[1])
+
+    systems = []
+    for entry in entries:
+        with open(entry.path) as file:
+            meta = json.load(file)
+        meta['metadata_path'] = entry.path
+        meta['source'] = os.path.normpath(os.path.join(directory, meta['source']))
+        systems.append(meta)
+    systems.sort(key=lambda meta: (meta.get('order', len(systems)), meta.get('label', meta['name'])))
+    registry = {meta['name']: meta for meta in systems}
+    _registry[directory] = (signature, registry)
+    return dict(registry)
+
+def get_system(name: str, directory: str = SYSTEMS_DIR) -> dict:
+    systems = list_systems(directory)
+    if name not in systems:
+        raise ValueError(f"Unknown system '{name}', expected one of {list(systems)}")
+    return systems[name]
+
+def _parse_values(meta: dict) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    names = meta['bodies']
+    n = len(names)
+    with open(meta['source']) as file:
+        values = np.array(file.read().split(), dtype=float)
+    if len(values) < 7*n:
+        raise ValueError(f"{meta['source']} holds {len(values)} values, {7*n} expected for {n} bodies")
+    masses = values[:n]
+    # Per body: vx vy vz x y z
+    rows = values[n:7*n].reshape(n, 2, 3)
+    return names, masses, rows[:, 1], rows[:, 0]
+
+def _parse_csv(meta: dict) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    table = pd.read_csv(meta['source'], skipinitialspace=True, float_precision='round_trip')
+    table.columns = [column.strip().lower() for column in table.columns]
+    names = table['name'].astype(str).tolist()
+    masses = table['mass'].to_numpy(dtype=float)
+    positions = table[['x', 'y', 'z']].to_numpy(dtype=float)
+    velocities = table[['vx', 'vy', 'vz']].to_numpy(dtype=float)
+    return names, masses, positions, velocities
+
+PARSERS = {
+    'values': _parse_values,
+    'csv': _parse_csv
+}
+
+def _stamp(meta: dict) -> np.ndarray:
+    stats = [os.stat(meta['metadata_path']), os.stat(meta['source'])]
+    return np.array([CACHE_VERSION] + [value for st in stats for value in (st.st_mtime_ns, st.st_size)],
+                    dtype=np.int64)
+
+def load_system_arrays(name: str, directory: str = SYSTEMS_DIR,
+                       cache_dir: str = CACHE_DIR) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (names, masses, positions, velocities) of a registered system, positions
+    and velocities of shape (n, 3). Served from the compiled cache when it is
+    up to date, otherwise parsed from the source and cached.
+    """
+    meta = get_system(name, directory)
+    stamp = _stamp(meta)
+    cache_path = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(meta['metadata_path']))[0]}.npz")
+
+    try:
+        with np.load(cache_path) as cached:
+            if np.array_equal(cached['stamp'], stamp):
+                return (cached['names'].tolist(), cached['masses'], cached['positions'],
+                        cached['velocities'])
+    except (OSError, KeyError, ValueError):
+        pass   # Missing or unreadable cache: rebuild it
+
+    fmt = meta.get('format', 'values')
+    if fmt not in PARSERS:
+        raise ValueError(f"Unknown system file format '{fmt}', expected one of {sorted(PARSERS)}")
+    names, masses, positions, velocities = PARSERS[fmt](meta)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temp, 'wb') as file:
+            np.savez(file, stamp=stamp, names=np.array(names, dtype=str), masses=masses,
+                     positions=positions, velocities=velocities)
+        os.replace(temp, cache_path)
+    except OSError:
+        pass   # Read-only data directory: parse every time
+    return names, masses, positions, velocities
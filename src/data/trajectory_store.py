@@ -0,0 +1,181 @@
+import json
+import os
+import numpy as np
+from typing import Iterator, List, Tuple
+
+MAGIC = b'NBTRAJ01'
+CHUNK_SIZE = 256   # Frames buffered per write
+HEADER_ALIGN = 4096
+
+# Trajectory file layout:
+#
+#     MAGIC (8 bytes) | header length (uint64 LE) | JSON header, space padded
+#     | frame 0 | frame 1 | ...
+#
+# The header is padded so frames start on a HEADER_ALIGN boundary. Each frame
+# is one fixed-size record [t, state...]: t of the header's time_dtype (float64;
+# files without it use dtype) and the state of its dtype, so frame i is
+# at data_offset + i * frame_bytes and the frame count follows from the file
+# size. Frames are written in chunks of at most chunk_size, which also makes a
+# file being written readable at any time and lets a writer reopen it to append.
+
+def _record_dtype(header: dict) -> np.dtype:
+    """Structured dtype of one frame, fields t and state."""
+    return np.dtype([('t', header.get('time_dtype', header['dtype'])),
+                     ('state', header['dtype'], (int(np.prod(header['state_shape'])),))])
+
+def _read_header(file) -> Tuple[dict, int]:
+    if file.read(8) != MAGIC:
+        raise ValueError(f"{file.name} is not a trajectory file")
+    length = int(np.frombuffer(file.read(8), dtype='<u8')[0])
+    header = json.loads(file.read(length).decode('utf-8'))
+    return header, 16 + length
+
+class TrajectoryWriter:
+    """Appends (times, states) chunks to a trajectory file."""
+    def __init__(self, path: str, names: List[str], masses: np.ndarray, integrator: str, dt: float,
+                 state_shape: Tuple[int, ...], system_name: str = None, chunk_size: int = CHUNK_SIZE,
+                 dtype: str = '<f8', **metadata):
+        self.path = path
+        self.header = {
+            'version': 1,
+            'system': system_name,
+            'names': list(names),
+            'masses': [float(m) for m in masses],
+            'integrator': integrator,
+            'dt': float(dt),
+            'state_shape': list(state_shape),
+            'dtype': np.dtype(dtype).str,
+            'time_dtype': '<f8',   # Kept at full precision even for single-precision states
+            'chunk_size': int(chunk_size),
+            **metadata
+        }
+        self._prepare()
+
+        encoded = json.dumps(self.header).encode('utf-8')
+        length = -(-(16 + len(encoded)) // HEADER_ALIGN) * HEADER_ALIGN - 16
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._file.write(np.array([length], dtype='<u8').tobytes())
+        self._file.write(encoded.ljust(length))
+
+    def _prepare(self):
+        self.dtype = np.dtype(self.header['dtype'])
+        self.record = _record_dtype(self.header)
+        self.chunk_size = self.header['chunk_size']
+        self._buffer = np.empty(self.chunk_size, dtype=self.record)
+        self._filled = 0
+        self.n_frames = 0
+
+    @classmethod
+    def reopen(cls, path: str, n_frames: int = None) -> 'TrajectoryWriter':
+        """Writer appending to an existing trajectory file, cut back to its first n_frames frames."""
+        writer = cls.__new__(cls)
+        writer.path = path
+        with open(path, 'rb') as file:
+            writer.header, data_offset = _read_header(file)
+        writer._prepare()
+
+        frame_bytes = writer.record.itemsize
+        available = (os.path.getsize(path) - data_offset) // frame_bytes
+        writer.n_frames = available if n_frames is None else min(n_frames, available)
+        writer._file = open(path, 'r+b')
+        writer._file.truncate(data_offset + writer.n_frames * frame_bytes)
+        writer._file.seek(0, os.SEEK_END)
+        return writer
+
+    @classmethod
+    def for_system(cls, path: str, system, integrator: str, dt: float,
+                   state_shape: Tuple[int, ...] = None, **kwargs) -> 'TrajectoryWriter':
+        """Writer whose header describes a SystemData instance."""
+        masses = system.get_masses()
+        if state_shape is None:
+            state_shape = (6 * len(masses),)
+        return cls(path, system.names, masses, integrator, dt,
+                   state_shape, system_name=system.system_name, **kwargs)
+
+    def append(self, times: np.ndarray, states: np.ndarray):
+        """Buffer frames, writing every completed chunk."""
+        states = states.reshape(len(times), -1)
+        start = 0
+        while start < len(times):
+            take = min(len(times) - start, self.chunk_size - self._filled)
+            rows = self._buffer[self._filled:self._filled + take]
+            rows['t'] = times[start:start + take]
+            rows['state'] = states[start:start + take]
+            self._filled += take
+            start += take
+            if self._filled == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        if self._filled:
+            self._file.write(self._buffer[:self._filled].tobytes())
+            self.n_frames += self._filled
+            self._filled = 0
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TrajectoryReader:
+    """
+    Memory-mapped view of a trajectory file. times and states index the file
+    directly, so any frame range is read without loading the whole run.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.header, self.data_offset = _read_header(file)
+        self.names = self.header['names']
+        self.masses = np.array(self.header['masses'])
+        self.integrator = self.header['integrator']
+        self.dt = self.header['dt']
+        self.state_shape = tuple(self.header['state_shape'])
+        self.dtype = np.dtype(self.header['dtype'])
+        self.record = _record_dtype(self.header)
+        self.refresh()
+
+    def refresh(self):
+        """Re-map the file to pick up frames appended since opening it."""
+        self.n_frames = max(0, (os.path.getsize(self.path) - self.data_offset) // self.record.itemsize)
+        if self.n_frames:
+            self._data = np.memmap(self.path, dtype=self.record, mode='r', offset=self.data_offset,
+                                   shape=(self.n_frames,))
+        else:
+            self._data = np.empty(0, dtype=self.record)
+        self.times = self._data['t']
+        self.states = self._data['state'].reshape((self.n_frames,) + self.state_shape)
+
+    def __len__(self) -> int:
+        return self.n_frames
+
+    def frames(self, start: int, stop: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(times, states) of frames [start, stop)."""
+        window = slice(start, stop)
+        return self.times[window], self.states[window]
+
+    def frame_at(self, t: float) -> int:
+        """Index of the last frame at or before time t."""
+        return max(0, int(np.searchsorted(self.times, t, side='right')) - 1)
+
+def write_trajectory(path: str, stream: Iterator[Tuple[np.ndarray, np.ndarray]], system,
+                     integrator: str, dt: float, **kwargs) -> TrajectoryReader:
+    """Write a simulate() stream for a SystemData to path and open it for reading."""
+    writer = None
+    for times, states in stream:
+        if writer is None:
+            writer = TrajectoryWriter.for_system(path, system, integrator, dt,
+                                                 state_shape=states.shape[1:], **kwargs)
+        writer.append(times, states)
+    if writer is not None:
+        writer.close()
+    return TrajectoryReader(path)
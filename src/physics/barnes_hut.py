@@ -0,0 +1,196 @@
+import numpy as np
+from ..utils.constants import G  # Must be in correct units: AU^3 / (M_sun · day^2)
+from ..utils import metrics
+
+MAX_DEPTH = 21       # 3 * 21 = 63 bits of Morton key
+LEAF_SIZE = 8        # Bodies per leaf before a cell is split
+TARGET_CHUNK = 4096  # Targets walked through the tree at once (bounds pair-list memory)
+
+_MORTON_MASKS = [
+    (32, np.uint64(0x1f00000000ffff)),
+    (16, np.uint64(0x1f0000ff0000ff)),
+    (8, np.uint64(0x100f00f00f00f00f)),
+    (4, np.uint64(0x10c30c30c30c30c3)),
+    (2, np.uint64(0x1249249249249249)),
+]
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Insert two zero bits between each of the low 21 bits of v."""
+    v = v & np.uint64(0x1fffff)
+    for shift, mask in _MORTON_MASKS:
+        v = (v | (v << np.uint64(shift))) & mask
+    return v
+
+def _segment_ids(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenate arange(start, start + count) for every segment."""
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+def _segment_reduce(ufunc, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Reduce values over disjoint, sorted [start, end) segments."""
+    padded = np.concatenate([values, values[:1]])
+    bounds = np.column_stack([starts, ends]).ravel()
+    return ufunc.reduceat(padded, bounds, axis=0)[::2]
+
+def morton_keys(positions: np.ndarray, max_depth: int = MAX_DEPTH):
+    """
+    Interleaved-bit cell keys of each body inside the bounding cube.
+    positions: shape (n, 3) in AU
+    Returns: (keys, origin, size) with keys of shape (n,) uint64
+    """
+    origin = positions.min(axis=0)
+    size = float((positions.max(axis=0) - origin).max()) or 1.0
+    cells = 1 << max_depth
+    ijk = np.floor((positions - origin) / size * cells).astype(np.int64)
+    ijk = np.clip(ijk, 0, cells - 1).astype(np.uint64)
+
+    keys = (_spread_bits(ijk[:, 0]) << np.uint64(2)) | (_spread_bits(ijk[:, 1]) << np.uint64(1)) \
+        | _spread_bits(ijk[:, 2])
+    return keys, origin, size
+
+class Octree:
+    """
+    Octree stored as flat node arrays over Morton-sorted bodies.
+
+    Node k owns the sorted bodies [start[k], end[k]) and its children are the
+    contiguous nodes [first_child[k], first_child[k] + n_children[k]).
+    """
+    def __init__(self, positions: np.ndarray, masses: np.ndarray,
+                 leaf_size: int = LEAF_SIZE, max_depth: int = MAX_DEPTH):
+        n = len(masses)
+        keys, _, _ = morton_keys(positions, max_depth)
+        self.order = np.argsort(keys, kind='stable')
+        keys = keys[self.order]
+        self.positions = positions[self.order]
+        self.masses = masses[self.order]
+
+        starts, ends, first_child, n_children = [], [], [], []
+        level_start, level_end = np.array([0]), np.array([n])
+        n_nodes = 0
+        for level in range(max_depth + 1):
+            n_level = len(level_start)
+            starts.append(level_start)
+            ends.append(level_end)
+            n_nodes += n_level
+
+            split = (level_end - level_start > leaf_size) & (level < max_depth)
+            children = np.zeros(n_level, dtype=np.int64)
+            first = np.zeros(n_level, dtype=np.int64)
+            if split.any():
+                # Bodies of the split cells, grouped by their next-level cell
+                parent_start, parent_end = level_start[split], level_end[split]
+                body = _segment_ids(parent_start, parent_end - parent_start)
+                prefix = keys[body] >> np.uint64(3 * (max_depth - level - 1))
+                breaks = np.flatnonzero(prefix[1:] != prefix[:-1]) + 1
+
+                child_start = body[np.concatenate([[0], breaks])]
+                child_end = body[np.concatenate([breaks, [len(body)]]) - 1] + 1
+                parent = np.searchsorted(parent_start, child_start, side='right') - 1
+
+                children[split] = np.bincount(parent, minlength=len(parent_start))
+                first[split] = n_nodes + np.cumsum(children[split]) - children[split]
+                level_start, level_end = child_start, child_end
+
+            first_child.append(first)
+            n_children.append(children)
+            if not split.any():
+                break
+
+        self.start = np.concatenate(starts)
+        self.end = np.concatenate(ends)
+        self.first_child = np.concatenate(first_child)
+        self.n_children = np.concatenate(n_children)
+        self._compute_moments()
+
+    def _compute_moments(self):
+        """Total mass, centre of mass and opening radius of every node."""
+        self.mass = _segment_reduce(np.add, self.masses, self.start, self.end)
+        weighted = _segment_reduce(np.add, self.masses[:, None] * self.positions, self.start, self.end)
+        lo = _segment_reduce(np.minimum, self.positions, self.start, self.end)
+        hi = _segment_reduce(np.maximum, self.positions, self.start, self.end)
+
+        # Massless cells fall back to the geometric centre of their bodies
+        centre = 0.5 * (lo + hi)
+        self.com = np.where(self.mass[:, None] > 0,
+                            weighted / np.where(self.mass > 0, self.mass, 1.0)[:, None], centre)
+
+        # Distance from the centre of mass to the farthest corner of the cell's bounding box
+        reach = np.maximum(self.com - lo, hi - self.com)
+        self.b_max2 = np.einsum('ij,ij->i', reach, reach)
+
+    def acceleration(self, theta: float = 0.5, out: np.ndarray = None) -> np.ndarray:
+        """
+        Barnes–Hut accelerations for every body, in the caller's (unsorted) order.
+        A cell is used as a point mass when b_max < theta * d.
+        """
+        n = len(self.masses)
+        acc = np.zeros((n, 3))
+        gm_body = G * self.masses
+        gm_node = G * self.mass
+        theta2 = theta * theta
+
+        for c0 in range(0, n, TARGET_CHUNK):
+            c1 = min(c0 + TARGET_CHUNK, n)
+            pair_t = np.arange(c0, c1)
+            pair_k = np.zeros(c1 - c0, dtype=np.int64)
+
+            while pair_t.size:
+                r_vec = self.com[pair_k] - self.positions[pair_t]
+                dist2 = np.einsum('ij,ij->i', r_vec, r_vec)
+                accept = self.b_max2[pair_k] < theta2 * dist2
+
+                # Far cells: monopole interaction
+                if accept.any():
+                    d2 = dist2[accept]
+                    w = gm_node[pair_k[accept]] / (d2 * np.sqrt(d2))
+                    self._scatter(acc, pair_t[accept] - c0, c0, c1, w[:, None] * r_vec[accept])
+
+                opened = ~accept
+                leaf = opened & (self.n_children[pair_k] == 0)
+
+                # Near leaves: direct sum over their bodies, skipping self pairs
+                if leaf.any():
+                    leaf_k = pair_k[leaf]
+                    counts = self.end[leaf_k] - self.start[leaf_k]
+                    tt = np.repeat(pair_t[leaf], counts)
+                    jj = _segment_ids(self.start[leaf_k], counts)
+                    r_vec_l = self.positions[jj] - self.positions[tt]
+                    d2 = np.einsum('ij,ij->i', r_vec_l, r_vec_l)
+                    w = np.zeros_like(d2)
+                    np.divide(gm_body[jj], d2 * np.sqrt(d2), out=w, where=d2 > 0)
+                    self._scatter(acc, tt - c0, c0, c1, w[:, None] * r_vec_l)
+
+                # Near internal cells: descend into children
+                internal = opened & ~leaf
+                internal_k = pair_k[internal]
+                counts = self.n_children[internal_k]
+                pair_t = np.repeat(pair_t[internal], counts)
+                pair_k = _segment_ids(self.first_child[internal_k], counts)
+
+        if out is None:
+            out = np.empty((n, 3))
+        out[self.order] = acc
+        return out
+
+    @staticmethod
+    def _scatter(acc: np.ndarray, local: np.ndarray, c0: int, c1: int, contrib: np.ndarray):
+        for axis in range(3):
+            acc[c0:c1, axis] += np.bincount(local, weights=contrib[:, axis], minlength=c1 - c0)
+
+@metrics.timed('nbody_force_evaluation_seconds', kernel='barnes-hut')
+def barnes_hut_acceleration(positions: np.ndarray, masses: np.ndarray, out: np.ndarray = None,
+                            theta: float = 0.5, leaf_size: int = LEAF_SIZE) -> np.ndarray:
+    """
+    Approximate gravitational accelerations with a Barnes–Hut octree, O(n log n).
+    positions: shape (..., n, 3) in AU, one tree is built per leading index
+    masses: shape (n,) in Solar masses
+    theta: opening angle, 0 reproduces the direct sum
+    Returns: shape (..., n, 3) accelerations in AU/day^2
+    """
+    if positions.ndim > 2:
+        if out is None:
+            out = np.empty(positions.shape)
+        for index in np.ndindex(positions.shape[:-2]):
+            barnes_hut_acceleration(positions[index], masses, out[index], theta, leaf_size)
+        return out
+    return Octree(positions, masses, leaf_size).acceleration(theta, out=out)
@@ -1,5 +1,103 @@
 import numpy as np
+from functools import partial
+from typing import Callable
 from ..utils.constants import G  # Must be in correct units: AU^3 / (M_sun · day^2)
+from ..utils import metrics
+from .barnes_hut import barnes_hut_acceleration
+from .threaded import threaded_acceleration
+
+# Number of bodies per side of a pairwise tile. Each tile holds a
+# (TILE_SIZE, TILE_SIZE, 3) float64 separation block (~6 MB at 512).
+TILE_SIZE = 512
+
+@metrics.timed('nbody_force_evaluation_seconds', kernel='direct')
+def pairwise_acceleration(positions: np.ndarray, masses: np.ndarray, out: np.ndarray = None,
+                          tile_size: int = TILE_SIZE, dtype: np.dtype = np.float64) -> np.ndarray:
+    """
+    Broadcast gravitational accelerations over (target, source) tiles.
+    positions: shape (..., n, 3) in AU, leading axes are independent systems
+    masses: shape (n,) in Solar masses; bodies of zero mass are test
+            particles, which only the massive bodies act on
+    out: optional shape (..., n, 3) array the accelerations are written into
+    dtype: precision of the pairwise temporaries; with np.float32 the tiles
+           take half the memory traffic and each tile's sum is added to the
+           float64 result
+    Returns: shape (..., n, 3) accelerations in AU/day^2
+    """
+    n = len(masses)
+    if out is None:
+        out = np.empty(positions.shape)
+    out[...] = 0.0
+    gm = (G * masses).astype(dtype, copy=False)
+    positions = positions.astype(dtype, copy=False)
+
+    # Massless test particles feel the field of the massive bodies but exert none
+    sources = positions
+    massive = np.flatnonzero(masses)
+    if len(massive) < n:
+        sources, gm = positions[..., massive, :], gm[massive]
+
+    # Shrink tiles for batched input so the temporaries stay the same size
+    batch = int(np.prod(positions.shape[:-2]))
+    tile_size = max(16, int(tile_size / np.sqrt(batch)))
+
+    for i0 in range(0, n, tile_size):
+        i1 = min(i0 + tile_size, n)
+        targets = positions[..., i0:i1, :]
+
+        for j0 in range(0, len(gm), tile_size):
+            j1 = min(j0 + tile_size, len(gm))
+            r_vec = sources[..., None, j0:j1, :] - targets[..., :, None, :]   # Vectors from i to j
+            dist2 = np.einsum('...ijk,...ijk->...ij', r_vec, r_vec)
+
+            # Self pairs (and coincident bodies) have zero separation and exert no force
+            inv_d3 = np.zeros_like(dist2)
+            np.divide(1.0, dist2 * np.sqrt(dist2), out=inv_d3, where=dist2 > 0)
+            inv_d3 *= gm[j0:j1]
+
+            out[..., i0:i1, :] += np.einsum('...ij,...ijk->...ik', inv_d3, r_vec)
+
+    return out
+
+@metrics.timed('nbody_force_evaluation_seconds', kernel='jerk')
+def n_body_acceleration_jerk(positions: np.ndarray, velocities: np.ndarray, masses: np.ndarray,
+                             targets: np.ndarray = None, tile_size: int = TILE_SIZE):
+    """
+    Accelerations and their time derivatives (jerks) on a subset of bodies.
+    positions, velocities: shape (n, 3) in AU and AU/day
+    masses: shape (n,) in Solar masses, zero for test particles
+    targets: indices of the bodies to evaluate, all bodies if None
+    Returns: (acc, jerk), each of shape (len(targets), 3)
+    """
+    n = len(masses)
+    if targets is None:
+        targets = np.arange(n)
+    acc = np.zeros((len(targets), 3))
+    jerk = np.zeros((len(targets), 3))
+    massive = np.flatnonzero(masses)
+    gm = G * masses[massive]
+    source_x, source_v = positions[massive], velocities[massive]
+
+    for i0 in range(0, len(targets), tile_size):
+        i1 = min(i0 + tile_size, len(targets))
+        tx, tv = positions[targets[i0:i1]], velocities[targets[i0:i1]]
+
+        for j0 in range(0, len(massive), tile_size):
+            j1 = min(j0 + tile_size, len(massive))
+            r_vec = source_x[None, j0:j1, :] - tx[:, None, :]
+            v_vec = source_v[None, j0:j1, :] - tv[:, None, :]
+            dist2 = np.einsum('ijk,ijk->ij', r_vec, r_vec)
+            rv = np.einsum('ijk,ijk->ij', r_vec, v_vec)
+
+            inv_d2 = np.zeros_like(dist2)
+            np.divide(1.0, dist2, out=inv_d2, where=dist2 > 0)
+            w = gm[j0:j1] * inv_d2 * np.sqrt(inv_d2)
+
+            acc[i0:i1] += np.einsum('ij,ijk->ik', w, r_vec)
+            jerk[i0:i1] += np.einsum('ij,ijk->ik', w, v_vec) \
+                - 3.0*np.einsum('ij,ijk->ik', w * rv * inv_d2, r_vec)
+
+    return acc, jerk
 
 def n_body_acceleration(positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
     """
@@ -8,31 +106,79 @@ def n_body_acceleration(positions: np.ndarray, masses: np.ndarray) -> np.ndarray
     masses: shape (n,) in Solar masses
     Returns: shape (n, 3) accelerations in AU/day^2
     """
+    return pairwise_acceleration(positions, masses)
+
+def total_energy(state: np.ndarray, masses: np.ndarray, tile_size: int = TILE_SIZE) -> np.ndarray:
+    """
+    Kinetic plus gravitational potential energy of a state.
+    state: shape (..., 6*n) as in n_body_derivative
+    masses: shape (n,) in Solar masses
+    Returns: shape (...) in mass units · AU^2/day^2
+    """
+    n = len(masses)
+    split = state.reshape(state.shape[:-1] + (2, n, 3))
+    positions, velocities = split[..., 0, :, :], split[..., 1, :, :]
+    kinetic = 0.5 * np.einsum('i,...ik,...ik->...', masses, velocities, velocities)
+
+    potential = np.zeros(state.shape[:-1])
+    for i0 in range(0, n, tile_size):
+        i1 = min(i0 + tile_size, n)
+        for j0 in range(0, n, tile_size):
+            j1 = min(j0 + tile_size, n)
+            r_vec = positions[..., None, j0:j1, :] - positions[..., i0:i1, None, :]
+            dist = np.sqrt(np.einsum('...ijk,...ijk->...ij', r_vec, r_vec))
+            inv_d = np.zeros_like(dist)
+            np.divide(1.0, dist, out=inv_d, where=dist > 0)
+            potential -= np.einsum('i,j,...ij->...', masses[i0:i1], masses[j0:j1], inv_d)
+
+    # Every pair was counted from both ends
+    return kinetic + 0.5 * G * potential
+
+def total_momentum(state: np.ndarray, masses: np.ndarray) -> np.ndarray:
+    """Linear momentum of a state (..., 6*n), shape (..., 3) in mass units · AU/day."""
     n = len(masses)
-    acc = np.zeros_like(positions)
-    
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                r_vec = positions[j] - positions[i]     # Vector from i to j
-                dist = np.linalg.norm(r_vec)
-                acc[i] += G * masses[j] * r_vec / dist**3
-    
-    return acc
-
-def n_body_derivative(t: float, state: np.ndarray, masses: np.ndarray) -> np.ndarray:
+    velocities = state[..., 3*n:].reshape(state.shape[:-1] + (n, 3))
+    return np.einsum('i,...ik->...k', masses, velocities)
+
+def angular_momentum(state: np.ndarray, masses: np.ndarray) -> np.ndarray:
+    """Angular momentum about the origin of a state (..., 6*n), shape (..., 3) in mass units · AU^2/day."""
+    n = len(masses)
+    split = state.reshape(state.shape[:-1] + (2, n, 3))
+    return np.einsum('i,...ik->...k', masses, np.cross(split[..., 0, :, :], split[..., 1, :, :]))
+
+FORCE_ENGINES = {
+    'direct': pairwise_acceleration,
+    'barnes-hut': barnes_hut_acceleration,
+    'threaded': threaded_acceleration,
+}
+
+def get_force_engine(name: str = 'direct', **options) -> Callable:
+    """
+    Returns an acceleration function(positions, masses, out=None) by name.
+    options are forwarded to the engine (e.g. theta for 'barnes-hut',
+    workers for 'threaded').
+    """
+    if name not in FORCE_ENGINES:
+        raise ValueError(f"Unknown force engine '{name}', expected one of {sorted(FORCE_ENGINES)}")
+    return partial(FORCE_ENGINES[name], **options)
+
+def n_body_derivative(t: float, state: np.ndarray, masses: np.ndarray,
+                      acceleration: Callable = pairwise_acceleration) -> np.ndarray:
     """
     Returns the time derivative of the state [pos, vel].
-    state: shape (6*n,) -> first 3*n are positions, last 3*n are velocities
+    state: shape (..., 6*n) -> first 3*n are positions, last 3*n are velocities;
+           leading axes batch independent systems sharing the same masses
     masses: shape (n,)
+    acceleration: force engine, see get_force_engine
     """
     n = len(masses)
+    batch_shape = state.shape[:-1]
     # Split positions, velocities
-    positions = state[:3*n].reshape(n, 3)
-    velocities = state[3*n:].reshape(n, 3)
-    
-    # Compute accelerations
-    accelerations = n_body_acceleration(positions, masses)
-    
-    # Derivative of [pos, vel] = [vel, acc]
-    return np.concatenate([velocities.flatten(), accelerations.flatten()])
\ No newline at end of file
+    positions = state.reshape(batch_shape + (2, n, 3))[..., 0, :, :]
+
+    # Derivative of [pos, vel] = [vel, acc], filled in place
+    derivative = np.empty(state.shape)
+    derivative[..., :3*n] = state[..., 3*n:]
+    acceleration(positions, masses, out=derivative.reshape(batch_shape + (2, n, 3))[..., 1, :, :])
+
+    return derivative
@@ -1,57 +1,550 @@
 import numpy as np
 from typing import Callable
+from .equations import n_body_acceleration_jerk, pairwise_acceleration
+from .kepler import kepler_drift
+from ..utils.constants import G
+from ..utils import metrics
 
 class NumericalIntegrator:
-    """Base class for numerical integrators"""
-    def __init__(self, func: Callable, dt: float):
+    """
+    Base class for numerical integrators.
+    States may carry leading batch axes, shape (..., 6*n); every member
+    is advanced by the same step.
+    """
+    requires_masses = False     # Whether the constructor takes masses=
+    uses_acceleration = False   # Whether the constructor takes acceleration=(t, positions, out)
+    supports_compensation = False  # Whether the constructor takes compensated=
+    uses_engine = True          # Whether forces come from the selected force engine
+    CHECKPOINT_FIELDS = ()      # Attributes that carry state from one step() to the next
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Time every integrator's own step(); undecorated when metrics are off
+        if 'step' in cls.__dict__:
+            cls.step = metrics.timed('nbody_integrator_step_seconds', integrator=cls.__name__)(cls.step)
+    
+    def __init__(self, func: Callable, dt: float, compensated: bool = False):
         self.func = func
         self.dt = dt
+        self.compensated = compensated
+        self._compensation = None
+        self._y_compensated = None
     
     def step(self, t: float, y: np.ndarray) -> np.ndarray:
         raise NotImplementedError
+    
+    def _advance(self, y: np.ndarray, increment: np.ndarray) -> np.ndarray:
+        """
+        y + increment. When compensated, the rounding error of each update is
+        carried into the next one (Kahan summation) as long as the next step
+        continues from this output, so small increments to a large state
+        are not lost.
+        """
+        if not self.compensated:
+            return y + increment
+        if self._y_compensated is None or not (y is self._y_compensated or
+                                               np.array_equal(y, self._y_compensated)):
+            self._compensation = np.zeros(y.shape)
+        increment = increment - self._compensation
+        y_new = y + increment
+        self._compensation = (y_new - y) - increment
+        self._y_compensated = y_new
+        return y_new
+    
+    def get_state(self) -> dict:
+        """
+        Copy of the internal state (history buffers, step size control,
+        counters) needed to continue exactly where the last step() ended.
+        """
+        state = {}
+        for name in self.CHECKPOINT_FIELDS:
+            value = getattr(self, name, None)
+            if value is not None:
+                state[name] = np.array(value, copy=True)
+        return state
+    
+    def set_state(self, state: dict):
+        """
+        Restore a get_state() copy. The next step() continues from it when
+        given the state the checkpointed integrator last returned.
+        """
+        for name in self.CHECKPOINT_FIELDS:
+            value = state.get(name)
+            if value is not None:
+                value = np.asarray(value)
+                value = value.item() if value.ndim == 0 else value.copy()
+            setattr(self, name, value)
 
 class EulerIntegrator(NumericalIntegrator):
+    supports_compensation = True
+    CHECKPOINT_FIELDS = ('_compensation', '_y_compensated')
+    
     def step(self, t: float, y: np.ndarray) -> np.ndarray:
-        return y + self.dt * self.func(t, y)
+        return self._advance(y, self.dt * self.func(t, y))
 
 class RK4Integrator(NumericalIntegrator):
+    supports_compensation = True
+    CHECKPOINT_FIELDS = ('_compensation', '_y_compensated')
+    
     def step(self, t: float, y: np.ndarray) -> np.ndarray:
         k1 = self.func(t, y)
         k2 = self.func(t + 0.5*self.dt, y + 0.5*self.dt*k1)
         k3 = self.func(t + 0.5*self.dt, y + 0.5*self.dt*k2)
         k4 = self.func(t + self.dt, y + self.dt*k3)
-        return y + (self.dt/6.0)*(k1 + 2*k2 + 2*k3 + k4)
+        return self._advance(y, (self.dt/6.0)*(k1 + 2*k2 + 2*k3 + k4))
 
 class VerletIntegrator(NumericalIntegrator):
+    """
+    Velocity Verlet in kick-drift-kick form.
+    Given acceleration(t, positions, out) the step updates preallocated
+    position/velocity buffers in place and carries the end-of-step
+    acceleration into the next step: one force evaluation and no state
+    allocation per step. The returned array is that buffer and is overwritten
+    by the next call, so copy it to keep it. Without acceleration, func is
+    evaluated twice per step and half of each derivative is discarded.
+    With compensated=True every kick and drift is a Kahan-compensated update.
+    """
+    uses_acceleration = True
+    supports_compensation = True
+    CHECKPOINT_FIELDS = ('_compensation',)
+    
+    def __init__(self, func: Callable, dt: float, acceleration: Callable = None,
+                 compensated: bool = False):
+        super().__init__(func, dt, compensated)
+        self.acceleration = acceleration
+        self._state = None
+    
+    def _load(self, t: float, y: np.ndarray):
+        n = y.shape[-1] // 6
+        # A compensation restored by set_state() belongs to the state resumed from
+        restored = self._state is None and self._compensation is not None \
+            and self._compensation.shape == y.shape
+        self._state = np.array(y, dtype=float)
+        halves = self._state.reshape(y.shape[:-1] + (2, n, 3))
+        self._pos, self._vel = halves[..., 0, :, :], halves[..., 1, :, :]
+        self._acc = np.empty_like(self._pos)
+        self._scratch = np.empty_like(self._pos)
+        if self.compensated:
+            if not restored:
+                self._compensation = np.zeros(y.shape)
+            halves = self._compensation.reshape(y.shape[:-1] + (2, n, 3))
+            self._c_pos, self._c_vel = halves[..., 0, :, :], halves[..., 1, :, :]
+            self._sum = np.empty_like(self._pos)
+        self.acceleration(t, self._pos, self._acc)
+    
+    def _sync(self, t: float, y: np.ndarray):
+        # Keep the cached acceleration only when continuing from the previous output
+        if self._state is None or (y is not self._state and
+                                   (y.shape != self._state.shape or not np.array_equal(y, self._state))):
+            self._load(t, y)
+    
     def step(self, t: float, y: np.ndarray) -> np.ndarray:
-        pos, vel = y[:len(y)//2], y[len(y)//2:]
-        acc = self.func(t, y)[len(y)//2:]
+        if self.acceleration is None:
+            return self._step_derivative(t, y)
+        
+        self._sync(t, y)
+        self._kick_drift_kick(t, self.dt)
+        return self._state
+    
+    def _kick_drift_kick(self, t: float, h: float):
+        np.multiply(self._acc, 0.5*h, out=self._scratch)   # Kick
+        self._add(self._vel, 'vel')
+        np.multiply(self._vel, h, out=self._scratch)       # Drift
+        self._add(self._pos, 'pos')
+        self.acceleration(t + h, self._pos, self._acc)
+        np.multiply(self._acc, 0.5*h, out=self._scratch)   # Kick
+        self._add(self._vel, 'vel')
+    
+    def _add(self, target: np.ndarray, part: str):
+        """target += the scratch increment, Kahan-compensated if enabled."""
+        if not self.compensated:
+            target += self._scratch
+            return
+        compensation = self._c_pos if part == 'pos' else self._c_vel
+        self._scratch -= compensation
+        np.add(target, self._scratch, out=self._sum)
+        np.subtract(self._sum, target, out=compensation)
+        compensation -= self._scratch
+        target[...] = self._sum
+    
+    def _step_derivative(self, t: float, y: np.ndarray) -> np.ndarray:
+        half = y.shape[-1] // 2
+        pos, vel = y[..., :half], y[..., half:]
+        acc = self.func(t, y)[..., half:]
         
         new_pos = pos + vel*self.dt + 0.5*acc*self.dt**2
-        new_acc = self.func(t + self.dt, np.concatenate([new_pos, vel]))[len(y)//2:]
+        new_acc = self.func(t + self.dt, np.concatenate([new_pos, vel], axis=-1))[..., half:]
         new_vel = vel + 0.5*(acc + new_acc)*self.dt
         
-        return np.concatenate([new_pos, new_vel])
+        return np.concatenate([new_pos, new_vel], axis=-1)
+
+class YoshidaIntegrator(VerletIntegrator):
+    """
+    Yoshida symplectic composition of kick-drift-kick substeps, order 4 or 6.
+    Costs 3 (order 4) or 7 (order 6) force evaluations per step. Without
+    acceleration, accelerations are taken from func.
+    """
+    _CBRT2 = 2**(1/3)
+    _W6 = [0.784513610477560, 0.235573213359357, -1.17767998417887]
+    COEFFICIENTS = {
+        4: [1/(2 - _CBRT2), -_CBRT2/(2 - _CBRT2), 1/(2 - _CBRT2)],
+        6: _W6 + [1 - 2*sum(_W6)] + _W6[::-1],
+    }
+    
+    def __init__(self, func: Callable, dt: float, acceleration: Callable = None, order: int = 4,
+                 compensated: bool = False):
+        super().__init__(func, dt, acceleration or self._acceleration_from_func, compensated)
+        if order not in self.COEFFICIENTS:
+            raise ValueError(f"order must be one of {sorted(self.COEFFICIENTS)}, got {order}")
+        self.order = order
+    
+    def _acceleration_from_func(self, t: float, positions: np.ndarray, out: np.ndarray):
+        n = positions.shape[-2]
+        state = np.zeros(positions.shape[:-2] + (6*n,))
+        state[..., :3*n] = positions.reshape(positions.shape[:-2] + (3*n,))
+        out[...] = self.func(t, state)[..., 3*n:].reshape(out.shape)
+    
+    def step(self, t: float, y: np.ndarray) -> np.ndarray:
+        self._sync(t, y)
+        for w in self.COEFFICIENTS[self.order]:
+            self._kick_drift_kick(t, w*self.dt)
+            t += w*self.dt
+        return self._state
 
 class AdamsBashforthIntegrator(NumericalIntegrator):
-    def __init__(self, func: Callable, dt: float, order: int = 4):
+    """
+    Adams–Bashforth–Moulton multistep method of configurable order (1–5).
+    With corrector=True each step is PECE: an Adams–Bashforth prediction, one
+    evaluation, an Adams–Moulton correction and one more evaluation. With
+    corrector=False it is the explicit Adams–Bashforth method, one evaluation
+    per step. Derivative history lives in a preallocated circular buffer and
+    the first order - 1 steps are bootstrapped with RK4 steps whose first
+    stage is the derivative just pushed to the history.
+    """
+    CHECKPOINT_FIELDS = ('_history', '_head', '_filled', '_y_last', '_f_last', 'n_evaluations')
+    # Coefficients of f_n, f_{n-1}, ... (predictor)
+    BASHFORTH = {
+        1: np.array([1.0]),
+        2: np.array([3, -1]) / 2,
+        3: np.array([23, -16, 5]) / 12,
+        4: np.array([55, -59, 37, -9]) / 24,
+        5: np.array([1901, -2774, 2616, -1274, 251]) / 720,
+    }
+    # Coefficients of f_{n+1}, f_n, f_{n-1}, ... (corrector)
+    MOULTON = {
+        1: np.array([1.0]),
+        2: np.array([1, 1]) / 2,
+        3: np.array([5, 8, -1]) / 12,
+        4: np.array([9, 19, -5, 1]) / 24,
+        5: np.array([251, 646, -264, 106, -19]) / 720,
+    }
+    
+    def __init__(self, func: Callable, dt: float, order: int = 4, corrector: bool = True):
         super().__init__(func, dt)
+        if order not in self.BASHFORTH:
+            raise ValueError(f"order must be one of {sorted(self.BASHFORTH)}, got {order}")
         self.order = order
-        self.history = []
+        self.corrector = corrector
+        self.n_evaluations = 0
+        self._history = None   # shape (order,) + state shape
+        self._head = -1        # slot of the newest derivative
+        self._filled = 0
+        self._y_last = None
+        self._f_last = None    # derivative at _y_last if already known
+    
+    def _eval(self, t: float, y: np.ndarray) -> np.ndarray:
+        self.n_evaluations += 1
+        return self.func(t, y)
+    
+    def _push(self, f: np.ndarray):
+        self._head = (self._head + 1) % self.order
+        self._history[self._head] = f
+        self._filled = min(self._filled + 1, self.order)
+    
+    def _weights(self, coeffs: np.ndarray) -> np.ndarray:
+        """Per-slot weights so that slot head - k gets coeffs[k]."""
+        weights = np.zeros(self.order)
+        weights[(self._head - np.arange(len(coeffs))) % self.order] = coeffs
+        return weights
+    
+    def step(self, t: float, y: np.ndarray) -> np.ndarray:
+        # Restart the history unless continuing from the previous output
+        if self._y_last is None or not (y is self._y_last or np.array_equal(y, self._y_last)):
+            self._history = np.empty((self.order,) + y.shape)
+            self._head, self._filled = -1, 0
+            self._f_last = None
+        
+        f = self._f_last if self._f_last is not None else self._eval(t, y)
+        self._push(f)
+        
+        if self._filled < self.order:
+            # RK4 bootstrap step, reusing f as k1
+            k2 = self._eval(t + 0.5*self.dt, y + 0.5*self.dt*f)
+            k3 = self._eval(t + 0.5*self.dt, y + 0.5*self.dt*k2)
+            k4 = self._eval(t + self.dt, y + self.dt*k3)
+            y_new = y + (self.dt/6.0)*(f + 2*k2 + 2*k3 + k4)
+            f_new = None
+        else:
+            history = self._history
+            y_new = y + self.dt*np.tensordot(self._weights(self.BASHFORTH[self.order]), history, axes=1)
+            f_new = None
+            if self.corrector:
+                moulton = self.MOULTON[self.order]
+                f_pred = self._eval(t + self.dt, y_new)
+                y_new = y + self.dt*(moulton[0]*f_pred +
+                                     np.tensordot(self._weights(moulton[1:]), history, axes=1))
+                f_new = self._eval(t + self.dt, y_new)
+        
+        self._y_last, self._f_last = y_new, f_new
+        return y_new
+
+class DormandPrinceIntegrator(NumericalIntegrator):
+    """
+    Adaptive Dormand–Prince 5(4) integrator.
+    Each call to step() advances by exactly dt (the output interval) using
+    as many internal steps as the rtol/atol error control requires.
+    """
+    C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1])
+    A = [
+        [],
+        [1/5],
+        [3/40, 9/40],
+        [44/45, -56/15, 32/9],
+        [19372/6561, -25360/2187, 64448/6561, -212/729],
+        [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    ]
+    B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])
+    # Difference between the 5th and embedded 4th order weights (last entry for the FSAL stage)
+    E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+    CHECKPOINT_FIELDS = ('h', '_y_last', '_k_last', 'n_accepted', 'n_rejected', 'n_evaluations')
+    
+    def __init__(self, func: Callable, dt: float, rtol: float = 1e-9, atol: float = 1e-12,
+                 safety: float = 0.9, min_factor: float = 0.2, max_factor: float = 5.0):
+        super().__init__(func, dt)
+        self.rtol = rtol
+        self.atol = atol
+        self.safety = safety
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.h = dt
+        self.n_accepted = 0
+        self.n_rejected = 0
+        self.n_evaluations = 0
+        self._y_last = None
+        self._k_last = None
+    
+    def _eval(self, t: float, y: np.ndarray) -> np.ndarray:
+        self.n_evaluations += 1
+        return self.func(t, y)
+    
+    def _error_norm(self, err: np.ndarray, y: np.ndarray, y_new: np.ndarray) -> float:
+        scale = self.atol + self.rtol*np.maximum(np.abs(y), np.abs(y_new))
+        # RMS norm per system, worst member of a batch controls the shared step
+        return float(np.sqrt(np.mean((err/scale)**2, axis=-1)).max())
+    
+    def step(self, t: float, y: np.ndarray) -> np.ndarray:
+        # First-same-as-last: reuse the final stage of the previous step when continuing from its output
+        if self._y_last is not None and (y is self._y_last or np.array_equal(y, self._y_last)):
+            k1 = self._k_last
+        else:
+            k1 = self._eval(t, y)
+        
+        t_end = t + self.dt
+        while t < t_end:
+            # A step too small to advance t means the error control has failed
+            if self.h < 16*np.finfo(float).eps*max(abs(t), 1.0):
+                raise RuntimeError(f"Dormand–Prince step size underflow at t={t} (h={self.h:.3g}): "
+                                   "the error tolerance cannot be met")
+            h = self.h
+            last = t + h >= t_end
+            if last:
+                h = t_end - t
+            
+            k = [k1]
+            for i in range(1, 6):
+                y_stage = y + h*sum(a*k_j for a, k_j in zip(self.A[i], k))
+                k.append(self._eval(t + self.C[i]*h, y_stage))
+            y_new = y + h*sum(b*k_j for b, k_j in zip(self.B, k) if b != 0)
+            k.append(self._eval(t + h, y_new))
+            
+            err_norm = self._error_norm(h*sum(e*k_j for e, k_j in zip(self.E, k) if e != 0), y, y_new)
+            if not np.isfinite(err_norm):
+                raise RuntimeError(f"Dormand–Prince error estimate is not finite at t={t}")
+            factor = self.safety*err_norm**-0.2 if err_norm > 0 else self.max_factor
+            factor = min(self.max_factor, max(self.min_factor, factor))
+            
+            if err_norm <= 1.0:
+                self.n_accepted += 1
+                t = t_end if last else t + h
+                y, k1 = y_new, k[6]
+                # A step truncated to hit the output time says nothing about a larger step
+                self.h = max(self.h, h*factor) if last else h*factor
+            else:
+                self.n_rejected += 1
+                self.h = h*min(1.0, factor)
+        
+        self._y_last, self._k_last = y, k1
+        return y
+
+class HermiteIntegrator(NumericalIntegrator):
+    """
+    Fourth-order Hermite predictor–corrector with hierarchical block time steps.
+    Every body advances on its own power-of-two fraction of dt (dt / 2**level,
+    level <= max_level) and forces are only evaluated for the bodies whose
+    step ends on the current block time. step() returns the synchronized state
+    after dt. Forces come from n_body_acceleration_jerk; func is not used.
+    """
+    requires_masses = True
+    uses_engine = False
+    CHECKPOINT_FIELDS = ('x', 'v', 'a', 'j', 'level', '_y_last', 'n_block_steps', 'n_force_evaluations')
+    
+    def __init__(self, func: Callable, dt: float, masses: np.ndarray,
+                 eta: float = 0.005, eta_start: float = 0.002, max_level: int = 20):
+        super().__init__(func, dt)
+        self.masses = masses
+        self.eta = eta
+        self.eta_start = eta_start
+        self.max_level = max_level
+        self.n_block_steps = 0
+        self.n_force_evaluations = 0
+        self._y_last = None
+    
+    def _levels(self, dt_wanted: np.ndarray) -> np.ndarray:
+        """Smallest level whose step dt / 2**level does not exceed dt_wanted."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            level = np.ceil(np.log2(self.dt / dt_wanted))
+        level = np.where(np.isfinite(level), level, 0)
+        return np.clip(level, 0, self.max_level).astype(np.int64)
+    
+    def _start(self, y: np.ndarray):
+        n = len(self.masses)
+        self.x = y[:3*n].reshape(n, 3).copy()
+        self.v = y[3*n:].reshape(n, 3).copy()
+        self.a, self.j = n_body_acceleration_jerk(self.x, self.v, self.masses)
+        self.n_force_evaluations += n
+        
+        a_norm = np.linalg.norm(self.a, axis=1)
+        j_norm = np.linalg.norm(self.j, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.level = self._levels(self.eta_start * a_norm / j_norm)
     
     def step(self, t: float, y: np.ndarray) -> np.ndarray:
-        self.history.append(self.func(t, y))
-        if len(self.history) < self.order:
-            # Use RK4 for initial steps
-            return RK4Integrator(self.func, self.dt).step(t, y)
+        if y.ndim > 1:
+            raise ValueError("HermiteIntegrator does not support batched states")
+        if self._y_last is None or not (y is self._y_last or np.array_equal(y, self._y_last)):
+            self._start(y)
         
-        if len(self.history) > self.order:
-            self.history.pop(0)
+        # Integer ticks keep block times exact: dt spans 2**max_level ticks
+        window = 1 << self.max_level
+        tick = self.dt / window
+        t_body = np.zeros(len(self.masses), dtype=np.int64)
+        
+        while t_body.min() < window:
+            step_ticks = window >> self.level
+            t_next = (t_body + step_ticks).min()
+            active = np.flatnonzero(t_body + step_ticks == t_next)
+            self.n_block_steps += 1
+            
+            # Predict every body to the block time
+            dt_p = ((t_next - t_body) * tick)[:, None]
+            x_p = self.x + dt_p*(self.v + dt_p*(self.a/2 + dt_p*self.j/6))
+            v_p = self.v + dt_p*(self.a + dt_p*self.j/2)
+            
+            a1, j1 = n_body_acceleration_jerk(x_p, v_p, self.masses, targets=active)
+            self.n_force_evaluations += len(active)
+            
+            # Hermite corrector for the active bodies
+            h = dt_p[active]
+            x0, v0, a0, j0 = self.x[active], self.v[active], self.a[active], self.j[active]
+            v1 = v0 + h/2*(a0 + a1) + h**2/12*(j0 - j1)
+            x1 = x0 + h/2*(v0 + v1) + h**2/12*(a0 - a1)
             
-        coeffs = {
-            2: [3/2, -1/2],
-            3: [23/12, -16/12, 5/12],
-            4: [55/24, -59/24, 37/24, -9/24]
-        }
+            # Aarseth criterion from the interpolated snap and crackle
+            a3 = (12*(a0 - a1) + 6*h*(j0 + j1)) / h**3
+            a2 = (-6*(a0 - a1) - h*(4*j0 + 2*j1)) / h**2 + h*a3
+            a1_n, j1_n = np.linalg.norm(a1, axis=1), np.linalg.norm(j1, axis=1)
+            a2_n, a3_n = np.linalg.norm(a2, axis=1), np.linalg.norm(a3, axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                wanted = self._levels(np.sqrt(self.eta * (a1_n*a2_n + j1_n**2) / (j1_n*a3_n + a2_n**2)))
+            
+            # Shrink freely; grow one level at a time and only on an aligned block time
+            level = self.level[active]
+            can_grow = (level > 0) & (t_next % (2*step_ticks[active]) == 0)
+            self.level[active] = np.where(wanted > level, wanted,
+                                          np.where((wanted < level) & can_grow, level - 1, level))
+            
+            self.x[active], self.v[active], self.a[active], self.j[active] = x1, v1, a1, j1
+            t_body[active] = t_next
+        
+        y_out = np.concatenate([self.x.ravel(), self.v.ravel()])
+        self._y_last = y_out
+        return y_out
+
+class WisdomHolmanIntegrator(NumericalIntegrator):
+    """
+    Wisdom–Holman mapping in democratic heliocentric coordinates.
+    Each step is an interaction half-kick, a half solar-momentum drift, an
+    exact Kepler drift of every body about the most massive one, another
+    half drift and a half-kick. Second order and symplectic, it allows steps
+    of a sizeable fraction of the shortest orbital period. Close encounters
+    between the other bodies are not resolved, and a moon only feels its
+    planet through the kicks, so its period, not the planets', limits the
+    step (the Solar System's Moon needs dt <= 2 days). Forces come from the planet–
+    planet direct sum; func is not used.
+    """
+    requires_masses = True
+    uses_engine = False
+    CHECKPOINT_FIELDS = ('q', 'p', 'acc', 'x_cm', 'v_cm', '_y_last', 'n_force_evaluations')
+    
+    def __init__(self, func: Callable, dt: float, masses: np.ndarray):
+        super().__init__(func, dt)
+        self.masses = masses
+        self.central = int(np.argmax(masses))
+        self.others = np.flatnonzero(np.arange(len(masses)) != self.central)
+        self.mu = G * masses[self.central]
+        self.n_force_evaluations = 0
+        self._y_last = None
+    
+    def _to_heliocentric(self, y: np.ndarray):
+        n = len(self.masses)
+        x = y.reshape(y.shape[:-1] + (2, n, 3))[..., 0, :, :]
+        v = y.reshape(y.shape[:-1] + (2, n, 3))[..., 1, :, :]
+        m = self.masses[:, None]
+        self.x_cm = (m * x).sum(axis=-2) / self.masses.sum()
+        self.v_cm = (m * v).sum(axis=-2) / self.masses.sum()
+        self.q = x[..., self.others, :] - x[..., self.central:self.central + 1, :]
+        self.p = v[..., self.others, :] - self.v_cm[..., None, :]
+        self.acc = pairwise_acceleration(self.q, self.masses[self.others])
+        self.n_force_evaluations += len(self.others)
+    
+    def _to_inertial(self) -> np.ndarray:
+        n = len(self.masses)
+        m = self.masses[self.others, None]
+        y = np.empty(self.q.shape[:-2] + (2, n, 3))
+        x_c = self.x_cm - (m * self.q).sum(axis=-2) / self.masses.sum()
+        y[..., 0, self.central, :] = x_c
+        y[..., 0, self.others, :] = self.q + x_c[..., None, :]
+        y[..., 1, self.central, :] = self.v_cm - (m * self.p).sum(axis=-2) / self.masses[self.central]
+        y[..., 1, self.others, :] = self.p + self.v_cm[..., None, :]
+        return y.reshape(self.q.shape[:-2] + (6*n,))
+    
+    def _jump(self, h: float):
+        m = self.masses[self.others, None]
+        self.q += h * (m * self.p).sum(axis=-2, keepdims=True) / self.masses[self.central]
+    
+    def step(self, t: float, y: np.ndarray) -> np.ndarray:
+        if self._y_last is None or not (y is self._y_last or np.array_equal(y, self._y_last)):
+            self._to_heliocentric(y)
+        
+        h = self.dt
+        self.p += 0.5*h*self.acc
+        self._jump(0.5*h)
+        self.q, self.p = kepler_drift(self.q, self.p, self.mu, h)
+        self._jump(0.5*h)
+        self.acc = pairwise_acceleration(self.q, self.masses[self.others])
+        self.n_force_evaluations += len(self.others)
+        self.p += 0.5*h*self.acc
+        self.x_cm = self.x_cm + h*self.v_cm
         
-        return y + self.dt * sum(c*f for c, f in zip(coeffs[self.order], reversed(self.history))) 
\ No newline at end of file
+        self._y_last = self._to_inertial()
+        return self._y_last
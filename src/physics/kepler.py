@@ -0,0 +1,66 @@
+import numpy as np
+
+def stumpff(z: np.ndarray):
+    """
+    Stumpff functions C(z) and S(z) for elliptic (z > 0), parabolic and
+    hyperbolic (z < 0) arguments, elementwise.
+    """
+    c = np.empty_like(z)
+    s = np.empty_like(z)
+    small = np.abs(z) < 1e-6
+    pos = (z > 0) & ~small
+    neg = (z < 0) & ~small
+
+    sz = np.sqrt(z[pos])
+    c[pos] = (1 - np.cos(sz)) / z[pos]
+    s[pos] = (sz - np.sin(sz)) / sz**3
+
+    sz = np.sqrt(-z[neg])
+    c[neg] = (np.cosh(sz) - 1) / -z[neg]
+    s[neg] = (np.sinh(sz) - sz) / sz**3
+
+    zs = z[small]
+    c[small] = 1/2 - zs/24 + zs**2/720
+    s[small] = 1/6 - zs/120 + zs**2/5040
+    return c, s
+
+def kepler_drift(positions: np.ndarray, velocities: np.ndarray, mu: float, dt: float,
+                 max_iter: int = 50, tol: float = 1e-14):
+    """
+    Propagate independent two-body orbits about a fixed centre by dt using
+    universal variables, vectorized over all bodies.
+    positions, velocities: shape (..., 3) relative to the centre (AU, AU/day)
+    mu: gravitational parameter G*M of the centre (AU^3/day^2)
+    Returns: (positions, velocities) after dt
+    """
+    r0 = np.linalg.norm(positions, axis=-1)
+    v2 = np.einsum('...k,...k->...', velocities, velocities)
+    sigma0 = np.einsum('...k,...k->...', positions, velocities) / np.sqrt(mu)
+    alpha = 2/r0 - v2/mu   # Reciprocal semi-major axis
+    sqrt_mu_dt = np.sqrt(mu) * dt
+
+    # Solve the universal Kepler equation F(chi) = 0 with Laguerre's method (n = 5)
+    chi = sqrt_mu_dt / r0
+    for _ in range(max_iter):
+        z = alpha * chi**2
+        c, s = stumpff(z)
+        f = sigma0*chi**2*c + (1 - alpha*r0)*chi**3*s + r0*chi - sqrt_mu_dt
+        df = sigma0*chi*(1 - z*s) + (1 - alpha*r0)*chi**2*c + r0
+        ddf = sigma0*(1 - z*c) + (1 - alpha*r0)*chi*(1 - z*s)
+        root = np.sqrt(np.abs(16*df**2 - 20*f*ddf))
+        delta = 5*f / (df + np.copysign(root, df))
+        chi = chi - delta
+        if np.all(np.abs(delta) <= tol * np.maximum(np.abs(chi), 1e-300)):
+            break
+
+    # Lagrange f and g coefficients
+    z = alpha * chi**2
+    c, s = stumpff(z)
+    f = 1 - chi**2/r0*c
+    g = dt - chi**3*s/np.sqrt(mu)
+    new_positions = f[..., None]*positions + g[..., None]*velocities
+    r = np.linalg.norm(new_positions, axis=-1)
+    fdot = np.sqrt(mu)/(r*r0)*(z*s - 1)*chi
+    gdot = 1 - chi**2/r*c
+    new_velocities = fdot[..., None]*positions + gdot[..., None]*velocities
+    return new_positions, new_velocities
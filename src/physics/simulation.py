@@ -0,0 +1,138 @@
+import numpy as np
+from typing import Callable, Iterator, Tuple
+from .integrators import (EulerIntegrator, RK4Integrator, VerletIntegrator,
+                          AdamsBashforthIntegrator, DormandPrinceIntegrator,
+                          HermiteIntegrator, YoshidaIntegrator, WisdomHolmanIntegrator,
+                          NumericalIntegrator)
+from .equations import n_body_derivative, get_force_engine
+
+INTEGRATORS = {
+    'euler': EulerIntegrator,
+    'rk4': RK4Integrator,
+    'verlet': VerletIntegrator,
+    'adams': AdamsBashforthIntegrator,
+    'dopri': DormandPrinceIntegrator,
+    'hermite': HermiteIntegrator,
+    'yoshida4': YoshidaIntegrator,
+    'yoshida6': YoshidaIntegrator,
+    'wh': WisdomHolmanIntegrator
+}
+
+METHOD_OPTIONS = {
+    'yoshida4': {'order': 4},
+    'yoshida6': {'order': 6}
+}
+
+CHUNK_SIZE = 256  # Output samples per yielded chunk
+
+# 'mixed' evaluates pairwise forces in float32 and keeps the float64 state
+# with Kahan-compensated updates
+PRECISIONS = ('double', 'mixed')
+MIXED_PRECISION_ENGINES = ('direct', 'threaded')
+
+def create_integrator(method: str, masses: np.ndarray, dt: float, engine: str = 'direct',
+                      precision: str = 'double', **engine_options) -> NumericalIntegrator:
+    """
+    Build the integrator for a method name with the selected force engine.
+    engine_options are passed to the engine, e.g. theta=0.5 for Barnes–Hut.
+    precision is one of PRECISIONS; 'mixed' needs a method that supports
+    compensated updates and an engine in MIXED_PRECISION_ENGINES.
+    """
+    if method not in INTEGRATORS:
+        raise ValueError(f"Unknown integration method '{method}', expected one of {sorted(INTEGRATORS)}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {list(PRECISIONS)}")
+
+    integrator_class = INTEGRATORS[method]
+    if not integrator_class.uses_engine and (engine != 'direct' or engine_options):
+        raise ValueError(f"Method '{method}' computes its own direct-sum forces and "
+                         f"cannot use the '{engine}' engine or engine options")
+    options = dict(METHOD_OPTIONS.get(method, {}))
+    if precision == 'mixed':
+        if not integrator_class.supports_compensation or engine not in MIXED_PRECISION_ENGINES:
+            supported = sorted(name for name, cls in INTEGRATORS.items() if cls.supports_compensation)
+            raise ValueError(f"Mixed precision needs one of the methods {supported} "
+                             f"and one of the engines {list(MIXED_PRECISION_ENGINES)}")
+        engine_options.setdefault('dtype', np.float32)
+        options['compensated'] = True
+    acceleration = get_force_engine(engine, **engine_options)
+    if integrator_class.requires_masses:
+        options['masses'] = masses
+    if integrator_class.uses_acceleration:
+        options['acceleration'] = lambda t, positions, out: acceleration(positions, masses, out=out)
+
+    return integrator_class(
+        lambda t, y: n_body_derivative(t, y, masses, acceleration),
+        dt,
+        **options
+    )
+
+def output_stride(dt: float, output_interval: float = None, decimate: int = 1) -> int:
+    """Number of integrator steps between two output samples."""
+    every = 1 if output_interval is None else max(1, int(round(output_interval / dt)))
+    return every * max(1, int(decimate))
+
+def total_steps(sim_time: float, dt: float, t0: float = 0.0) -> int:
+    """Number of integrator steps simulate() takes over [t0, t0 + sim_time)."""
+    # Same count as len(np.arange(t0, t0 + sim_time, dt)) - 1, without building the grid,
+    # and 0 rather than -1 for an empty run
+    return max(0, int(np.ceil(((t0 + sim_time) - t0) / dt)) - 1)
+
+def simulate(integrator: NumericalIntegrator, initial_state: np.ndarray, sim_time: float,
+             output_interval: float = None, decimate: int = 1, chunk_size: int = CHUNK_SIZE,
+             callback: Callable = None, t0: float = 0.0,
+             start_step: int = 0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Stream a simulation as (times, states) chunks.
+    The integrator steps over the same grid as np.arange(t0, t0 + sim_time, dt);
+    a sample is kept every output_interval (rounded to whole steps), thinned
+    further by decimate. The initial and final states are always kept. Only one chunk
+    of at most chunk_size samples is held in memory at a time.
+    callback(steps_done, total_steps, t, state) runs at every sample and may
+    return False to stop the run early.
+    start_step resumes a run: initial_state is the state after start_step
+    steps (with the integrator restored by set_state()) and is not emitted again.
+    """
+    dt = integrator.dt
+    n_steps = total_steps(sim_time, dt, t0)
+    stride = output_stride(dt, output_interval, decimate)
+
+    times = np.empty(chunk_size)
+    states = np.empty((chunk_size,) + initial_state.shape)
+    filled = 0
+    if not start_step:
+        times[0], states[0] = t0, initial_state
+        filled = 1
+    if callback is not None and callback(start_step, n_steps, t0 + start_step*dt, initial_state) is False:
+        if filled:
+            yield times[:filled], states[:filled]
+        return
+
+    state = initial_state
+    for i in range(start_step + 1, n_steps + 1):
+        # Feed the returned object back in so integrators keep their cached state
+        state = integrator.step(t0 + (i - 1)*dt, state)
+        if i % stride and i != n_steps:
+            continue
+
+        t = t0 + i*dt
+        times[filled], states[filled] = t, state
+        filled += 1
+        stop = callback is not None and callback(i, n_steps, t, state) is False
+
+        if filled == chunk_size or stop:
+            yield times[:filled], states[:filled]
+            times = np.empty(chunk_size)
+            states = np.empty((chunk_size,) + initial_state.shape)
+            filled = 0
+        if stop:
+            return
+
+    if filled:
+        yield times[:filled], states[:filled]
+
+def collect(stream: Iterator[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate a simulate() stream into (times, states) arrays."""
+    chunks = list(stream)
+    return (np.concatenate([times for times, _ in chunks]),
+            np.concatenate([states for _, states in chunks]))
@@ -0,0 +1,115 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ..utils.constants import G  # Must be in correct units: AU^3 / (M_sun · day^2)
+from ..utils import metrics
+
+THREADS = int(os.environ.get('NBODY_THREADS', os.cpu_count() or 1))
+ROW_BLOCK = 256          # Most target rows per task
+SOURCE_TILE = 512        # Source bodies per pass over a row block
+PARALLEL_MIN_BODIES = 512  # Below this the pool costs more than it saves
+
+# Row-block parallel direct summation. Each task owns a block of target rows
+# and sweeps every source tile with preallocated per-thread scratch buffers,
+# so the NumPy loops run without allocating and with the GIL released.
+# Results match pairwise_acceleration up to summation order. As there, only
+# bodies of nonzero mass are sources, so massless test particles cost
+# O(N_massive) each.
+
+_pools = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+def _pool(workers: int) -> ThreadPoolExecutor:
+    pool = _pools.get(workers)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(workers)
+            if pool is None:
+                pool = _pools[workers] = ThreadPoolExecutor(workers, thread_name_prefix='nbody-force')
+    return pool
+
+def _scratch(rows: int, cols: int, dtype: np.dtype):
+    """This thread's (separations, distances, weights, partial sums) buffers, grown as needed."""
+    if not hasattr(_local, 'buffers'):
+        _local.buffers = {}
+    dtype = np.dtype(dtype)
+    buffers = _local.buffers.get(dtype)
+    if buffers is None or buffers[1].shape[0] < rows or buffers[1].shape[1] < cols:
+        rows = max(rows, buffers[1].shape[0] if buffers else 0)
+        cols = max(cols, buffers[1].shape[1] if buffers else 0)
+        buffers = _local.buffers[dtype] = (np.empty((rows, cols, 3), dtype), np.empty((rows, cols), dtype),
+                                           np.empty((rows, cols), dtype), np.empty((rows, 3), dtype))
+    return buffers
+
+def _accumulate_rows(positions: np.ndarray, sources: np.ndarray, gm: np.ndarray, out: np.ndarray,
+                     i0: int, i1: int, tile_size: int):
+    """Accelerations on targets i0:i1 of one (n, 3) system from its sources, written to out[i0:i1]."""
+    n_sources = len(gm)
+    rows = i1 - i0
+    r_buf, d2_buf, w_buf, part_buf = _scratch(rows, min(tile_size, n_sources), gm.dtype)
+    targets = positions[i0:i1]
+    acc = out[i0:i1]
+    acc[...] = 0.0
+    part = part_buf[:rows]
+
+    for j0 in range(0, n_sources, tile_size):
+        j1 = min(j0 + tile_size, n_sources)
+        r_vec = r_buf[:rows, :j1 - j0]
+        dist2 = d2_buf[:rows, :j1 - j0]
+        w = w_buf[:rows, :j1 - j0]
+
+        np.subtract(sources[None, j0:j1, :], targets[:, None, :], out=r_vec)   # Vectors from i to j
+        np.einsum('ijk,ijk->ij', r_vec, r_vec, out=dist2)
+        np.sqrt(dist2, out=w)
+        w *= dist2
+        # Zero separations (self pairs) keep w = 0 and exert no force
+        np.divide(gm[j0:j1], w, out=w, where=w > 0)
+
+        np.einsum('ij,ijk->ik', w, r_vec, out=part)
+        acc += part
+
+@metrics.timed('nbody_force_evaluation_seconds', kernel='threaded')
+def threaded_acceleration(positions: np.ndarray, masses: np.ndarray, out: np.ndarray = None,
+                          workers: int = THREADS, row_block: int = ROW_BLOCK,
+                          tile_size: int = SOURCE_TILE,
+                          min_bodies: int = PARALLEL_MIN_BODIES,
+                          dtype: np.dtype = np.float64) -> np.ndarray:
+    """
+    Direct-summation accelerations with target row blocks evaluated on a
+    persistent thread pool of the given number of workers.
+    positions: shape (..., n, 3) in AU, leading axes are independent systems
+    masses: shape (n,) in Solar masses, zero for test particles
+    out: optional shape (..., n, 3) array the accelerations are written into
+    dtype: precision of the pairwise scratch buffers, see pairwise_acceleration
+    Systems smaller than min_bodies are evaluated in the calling thread.
+    Returns: shape (..., n, 3) accelerations in AU/day^2
+    """
+    n = len(masses)
+    result = out if out is not None and out.flags.c_contiguous else np.empty(positions.shape)
+    systems = np.ascontiguousarray(positions, dtype=dtype).reshape(-1, n, 3)
+    accelerations = result.reshape(-1, n, 3)
+    massive = np.flatnonzero(masses)
+    gm = (G * np.asarray(masses, dtype=float)[massive]).astype(dtype)
+    sources = systems if len(massive) == n else np.ascontiguousarray(systems[:, massive])
+
+    # Row blocks in either case, so scratch stays at row_block x tile_size per thread
+    if workers <= 1 or n < min_bodies:
+        for system, source, acc in zip(systems, sources, accelerations):
+            for i0 in range(0, n, row_block):
+                _accumulate_rows(system, source, gm, acc, i0, min(i0 + row_block, n), tile_size)
+    else:
+        # At least one block per worker so every core gets work
+        rows = max(16, min(row_block, -(-n // workers)))
+        pool = _pool(workers)
+        tasks = [pool.submit(_accumulate_rows, system, source, gm, acc, i0, min(i0 + rows, n), tile_size)
+                 for system, source, acc in zip(systems, sources, accelerations)
+                 for i0 in range(0, n, rows)]
+        for task in tasks:
+            task.result()
+
+    if out is not None and result is not out:
+        out[...] = result
+        return out
+    return result
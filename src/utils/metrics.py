@@ -0,0 +1,274 @@
+import atexit
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Tuple
+
+ENABLED = os.environ.get('NBODY_METRICS', '1').lower() not in ('0', 'false', 'off', 'no')
+METRICS_DIR = os.environ.get('NBODY_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'nbody-metrics'))
+FLUSH_INTERVAL = 5.0   # Seconds between snapshots of a process's metrics
+
+SECONDS_BUCKETS = (1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0, 120.0)
+BYTES_BUCKETS = (1e2, 1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7, 1e8)
+
+# Metrics are kept per process. Processes that export them (the server,
+# which calls start_export(), its forked workers and its simulation job
+# processes) snapshot them to METRICS_DIR/<pid>-<start>.json from a
+# background thread; benchmarks, sweeps and scripts export nothing. When a
+# process exits, or render() finds its process gone, its file is folded into
+# METRICS_DIR/retired.json, so render() reads one file per live process plus
+# one and the totals never go backwards. With NBODY_METRICS=0 timed()
+# returns functions undecorated and observe()/inc() return immediately.
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, str], float] = {}
+_histograms: Dict[Tuple[str, str], Histogram] = {}
+_help: Dict[str, str] = {
+    'nbody_force_evaluation_seconds': "Wall time of one force kernel call, by kernel",
+    'nbody_integrator_step_seconds': "Wall time of one integrator step() call, by integrator",
+    'nbody_system_load_seconds': "Wall time of loading a SystemData",
+    'nbody_figure_build_seconds': "Wall time of building a figure or patch, by builder",
+    'nbody_callback_seconds': "Wall time of a Dash callback request including serialization, by output",
+    'nbody_callback_payload_bytes': "Size of a Dash callback response body, by output",
+    'nbody_runs_total': "Simulation requests, by method and whether served from cache or run as a job",
+}
+_flusher_pid = None
+_exporting = False
+RETIRED_FILE = 'retired.json'
+
+def _labels(labels: dict) -> str:
+    def escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in sorted(labels.items()))
+
+def describe(name: str, text: str):
+    """HELP text of a metric in the Prometheus output."""
+    _help[name] = text
+
+def _histogram(key: Tuple[str, str], buckets: Tuple[float, ...]) -> Histogram:
+    hist = _histograms.get(key)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(key, Histogram(buckets))
+        _start_flusher()
+    return hist
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = SECONDS_BUCKETS, **labels):
+    if ENABLED:
+        _histogram((name, _labels(labels)), buckets).observe(value)
+
+def inc(name: str, value: float = 1.0, **labels):
+    if ENABLED:
+        key = (name, _labels(labels))
+        with _lock:
+            _counters[key] = _counters.get(key, 0.0) + value
+        _start_flusher()
+
+def timed(name: str, **labels) -> Callable:
+    """Decorator recording the wall time of every call in a histogram."""
+    def decorate(func: Callable) -> Callable:
+        if not ENABLED:
+            return func
+        key = (name, _labels(labels))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _histogram(key, SECONDS_BUCKETS).observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def start_export(clear: bool = False):
+    """
+    Snapshot this process's metrics to METRICS_DIR for render(), and those of
+    processes forked from it. clear=True removes the files of earlier server
+    runs; call it once at server startup, before workers are forked.
+    """
+    global _exporting
+    if not ENABLED:
+        return
+    if clear:
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    _exporting = True
+    if _counters or _histograms:
+        _start_flusher()
+
+def exporting() -> bool:
+    return _exporting
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            'counters': [[name, labels, value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, labels, list(hist.bounds), list(hist.counts), hist.sum, hist.count]
+                           for (name, labels), hist in _histograms.items()]
+        }
+
+_process_file = None
+
+def flush():
+    """Write this process's snapshot for render() to aggregate."""
+    global _process_file
+    if not _exporting or not (_counters or _histograms):
+        return
+    if _process_file is None:
+        _process_file = os.path.join(METRICS_DIR, f'{os.getpid()}-{time.time_ns()}.json')
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        temp = f'{_process_file}.tmp'
+        with open(temp, 'w') as file:
+            json.dump(snapshot(), file)
+        os.replace(temp, _process_file)
+    except OSError:
+        pass   # Metrics must never break the application
+
+def _flush_periodically():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+def _start_flusher():
+    # One thread per exporting process; a forked worker starts its own
+    global _flusher_pid
+    if _exporting and _flusher_pid != os.getpid():
+        with _lock:
+            if _flusher_pid == os.getpid():
+                return
+            _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True).start()
+        atexit.register(_exit)
+
+def _exit():
+    # Also registered in a forked worker by its parent: retire only once
+    global _exporting
+    flush()
+    _exporting = False
+    if _process_file is not None:
+        _retire(_process_file)
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _load(path: str):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _combine(snapshots) -> Tuple[Dict[Tuple[str, str], float], Dict[Tuple[str, str], list]]:
+    """Sum snapshots into counters and [bounds, counts, sum, count] histograms."""
+    counters: Dict[Tuple[str, str], float] = {}
+    histograms: Dict[Tuple[str, str], list] = {}
+    for data in snapshots:
+        for name, labels, value in data['counters']:
+            counters[name, labels] = counters.get((name, labels), 0.0) + value
+        for name, labels, bounds, counts, total, count in data['histograms']:
+            merged = histograms.setdefault((name, labels), [bounds, [0] * len(counts), 0.0, 0])
+            if merged[0] != bounds:
+                continue   # Buckets changed between versions; skip the old process
+            merged[1] = [a + b for a, b in zip(merged[1], counts)]
+            merged[2] += total
+            merged[3] += count
+    return counters, histograms
+
+def _retire(path: str):
+    """Fold the snapshot of a finished process into the retired totals."""
+    try:
+        with open(os.path.join(METRICS_DIR, 'retired.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            data = _load(path)
+            if data is None:
+                return   # Already retired by another process
+            retired = os.path.join(METRICS_DIR, RETIRED_FILE)
+            counters, histograms = _combine([data] + [d for d in [_load(retired)] if d is not None])
+            temp = f'{retired}.{os.getpid()}.tmp'
+            with open(temp, 'w') as file:
+                json.dump({'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                           'histograms': [[name, labels] + merged for (name, labels), merged in histograms.items()]},
+                          file)
+            os.replace(temp, retired)
+            os.remove(path)
+    except OSError:
+        pass   # Metrics must never break the application
+
+def _after_fork():
+    # A forked worker reports only its own work, under its own file
+    global _lock, _flusher_pid, _process_file
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+    _flusher_pid = _process_file = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+def render() -> str:
+    """Prometheus text exposition of the metrics summed over all processes."""
+    flush()
+    try:
+        entries = [entry for entry in os.scandir(METRICS_DIR) if entry.name.endswith('.json')]
+    except FileNotFoundError:
+        entries = []
+    # Fold the files of processes that died without retiring them (e.g. killed)
+    for entry in entries:
+        if entry.name != RETIRED_FILE and not _alive(int(entry.name.split('-')[0])):
+            _retire(entry.path)
+    snapshots = [_load(entry.path) for entry in os.scandir(METRICS_DIR) if entry.name.endswith('.json')] \
+        if os.path.isdir(METRICS_DIR) else []
+    counters, histograms = _combine(data for data in snapshots if data is not None)
+
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        if name in _help:
+            lines.append(f'# HELP {name} {_help[name]}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{{{labels}}} {value!r}' if labels else f'{name} {value!r}')
+    for name in sorted({name for name, _ in histograms}):
+        if name in _help:
+            lines.append(f'# HELP {name} {_help[name]}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), (bounds, counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, bucket in zip(list(bounds) + ['+Inf'], counts):
+                cumulative += bucket
+                le = bound if bound == '+Inf' else f'{bound:g}'
+                lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{name}_sum{suffix} {total!r}')
+            lines.append(f'{name}_count{suffix} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,44 @@
+// Client-side animation playback: frames are built in the browser from the
+// decimated trajectory in the 'playback-data' store, without server round trips.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    nbody: {
+        togglePlayback: function(animateClicks, simData, playbackMode, disabled) {
+            const triggered = dash_clientside.callback_context.triggered;
+            const trigger = triggered.length ? triggered[0].prop_id : '';
+            if (playbackMode !== 'client' || !trigger.startsWith('animate-button')) {
+                return true;
+            }
+            return !disabled;
+        },
+
+        playbackFrame: function(nIntervals, frame, frameSkip, data) {
+            if (!data) {
+                return [dash_clientside.no_update, frame, dash_clientside.no_update];
+            }
+            const next = frame + frameSkip < data.n_frames ? frame + frameSkip : 0;
+            const start = Math.max(0, next - data.trail);
+            const axes = data.z ? ['x', 'y', 'z'] : ['x', 'y'];
+
+            const figure = {
+                layout: Object.assign({}, data.template.layout, {
+                    title: Object.assign({}, data.template.layout.title,
+                                         {text: 'Time: ' + data.times[next] + ' days'})
+                }),
+                data: data.template.data.map(function(trace, k) {
+                    const body = Math.floor(k / 2);
+                    const updated = Object.assign({}, trace);
+                    axes.forEach(function(axis) {
+                        // Even traces are trails, odd traces the current positions
+                        updated[axis] = k % 2 === 0
+                            ? data[axis][body].slice(start, next + 1)
+                            : [data[axis][body][next]];
+                    });
+                    return updated;
+                })
+            };
+            // The graph no longer holds the server's animation skeleton, so the
+            // next server-side frame must rebuild it rather than patch it
+            return [figure, next, null];
+        }
+    }
+});
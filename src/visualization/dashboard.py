@@ -1,11 +1,18 @@
 import plotly.graph_objects as go
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output, State
+from dash import dcc, html, Patch
+from dash.dependencies import Input, Output, State, ClientsideFunction
 import numpy as np
-from ..physics.integrators import EulerIntegrator, RK4Integrator, VerletIntegrator, AdamsBashforthIntegrator
-from ..physics.equations import n_body_derivative
+import time
+import flask
+from ..physics.simulation import create_integrator, simulate, collect
 from ..data.celestial_bodies import SystemData
+from ..data.systems import list_systems
+from ..data.trajectory_store import write_trajectory, TrajectoryReader
+from ..data.run_store import RunStore, cache_key
+from ..data.jobs import JobManager, FINISHED
+from .lod import downsample_trajectories, LOD_POINTS
+from ..utils import metrics
 
 # Define some styling constants
 COLORS = {
@@ -15,6 +22,9 @@ COLORS = {
     'paper': '#2d3339',
 }
 
+PLAYBACK_FRAMES = 600  # Frames shipped to the browser for client-side playback
+PLAYBACK_TRAIL = 50    # Trail length of client-side playback, in shipped frames
+
 PLOT_LAYOUT = {
     'paper_bgcolor': COLORS['paper'],
     'plot_bgcolor': COLORS['background'],
@@ -26,24 +36,64 @@ class NBodyDashboard:
     # Move METHOD_INFO inside the class as a class attribute
     METHOD_INFO = {
         'euler': {
+            'label': 'Euler',
             'description': 'Simple first-order method. Fast but least accurate.',
             'precision': 'Low precision',
             'color': '#ff9800'  # Orange for low precision
         },
         'rk4': {
+            'label': 'RK4',
             'description': 'Fourth-order method with good stability. Excellent balance of speed and accuracy.',
             'precision': 'High precision',
             'color': '#4CAF50'  # Green for high precision
         },
         'verlet': {
+            'label': 'Verlet',
             'description': 'Symplectic integrator that conserves energy well. Great for orbital mechanics.',
             'precision': 'High precision',
             'color': '#4CAF50'  # Green for high precision
         },
         'adams': {
+            'label': 'Adams',
             'description': 'Multi-step method using previous solutions. Good for smooth systems.',
             'precision': 'Medium precision',
             'color': '#2196F3'  # Blue for medium precision
+        },
+        'dopri': {
+            'label': 'Dopri5',
+            'description': 'Adaptive Dormand–Prince 5(4) method. The step size sets the output interval; '
+                           'internal steps shrink near close approaches.',
+            'precision': 'High precision',
+            'color': '#4CAF50'  # Green for high precision
+        },
+        'hermite': {
+            'label': 'Hermite',
+            'description': 'Fourth-order Hermite scheme with individual block time steps. '
+                           'Fast bodies take finer steps than slow ones.',
+            'precision': 'High precision',
+            'color': '#4CAF50'  # Green for high precision
+        },
+        'yoshida4': {
+            'label': 'Yoshida4',
+            'description': 'Fourth-order symplectic composition of Verlet steps. '
+                           'No secular energy drift on long runs.',
+            'precision': 'High precision',
+            'color': '#4CAF50'  # Green for high precision
+        },
+        'yoshida6': {
+            'label': 'Yoshida6',
+            'description': 'Sixth-order symplectic composition of Verlet steps. '
+                           'Allows larger steps on long runs.',
+            'precision': 'High precision',
+            'color': '#4CAF50'  # Green for high precision
+        },
+        'wh': {
+            'label': 'Wisdom-Holman',
+            'description': 'Symplectic map with exact Kepler orbits about the Sun and interaction kicks. '
+                           'Steps of tens of days only without moons: with the Moon keep steps of '
+                           '2 days or less, and avoid close encounters.',
+            'precision': 'High precision',
+            'color': '#4CAF50'  # Green for high precision
         }
     }
 
@@ -56,9 +106,14 @@ class NBodyDashboard:
         )
         self.app.title = "N-Body Simulation"
         self.system = None
+        self.integrator = None
         self.current_results = None
+        self.runs = RunStore()
+        self.jobs = JobManager(self.runs)
+        self._skeletons = {}
         self.setup_layout()
         self.setup_callbacks()
+        self.setup_metrics()
     
     def create_control_panel(self):
         return html.Div([
@@ -68,10 +123,8 @@ class NBodyDashboard:
             dcc.Dropdown(
                 id='system-dropdown',
                 options=[
-                    {'label': 'Solar System', 'value': 'solar system'},
-                    {'label': 'Voyager 1', 'value': 'Voyager 1'},
-                    {'label': 'Voyager 2', 'value': 'Voyager 2'},
-                    {'label': 'Halley Comet', 'value': 'halley'}
+                    {'label': meta.get('label', name), 'value': name}
+                    for name, meta in list_systems().items()
                 ],
                 value='solar system',
                 className='control-dropdown'
@@ -91,61 +144,21 @@ class NBodyDashboard:
             html.Div([
                 html.Label("Integration Method:", className='control-label'),
                 html.Div([
-                    html.Div([
-                        html.Button(
-                            ['Euler ', html.I(className="fas fa-info-circle")],  # Note the space after 'Euler'
-                            id='euler-button',
-                            className='method-button',
-                            n_clicks=0
-                        ),
-                        html.Span(
-                            self.METHOD_INFO['euler']['description'] + 
-                            f" ({self.METHOD_INFO['euler']['precision']})",
-                            className='method-tooltip'
-                        )
-                    ], className='method-button-container'),
-                    
-                    html.Div([
-                        html.Button(
-                            ['RK4 ', html.I(className="fas fa-info-circle")],
-                            id='rk4-button',
-                            className='method-button active',
-                            n_clicks=0
-                        ),
-                        html.Span(
-                            self.METHOD_INFO['rk4']['description'] + 
-                            f" ({self.METHOD_INFO['rk4']['precision']})",
-                            className='method-tooltip'
-                        )
-                    ], className='method-button-container'),
-                    
-                    html.Div([
-                        html.Button(
-                            ['Verlet ', html.I(className="fas fa-info-circle")],
-                            id='verlet-button',
-                            className='method-button',
-                            n_clicks=0
-                        ),
-                        html.Span(
-                            self.METHOD_INFO['verlet']['description'] + 
-                            f" ({self.METHOD_INFO['verlet']['precision']})",
-                            className='method-tooltip'
-                        )
-                    ], className='method-button-container'),
-                    
-                    html.Div([
-                        html.Button(
-                            ['Adams ', html.I(className="fas fa-info-circle")],
-                            id='adams-button',
-                            className='method-button',
-                            n_clicks=0
-                        ),
-                        html.Span(
-                            self.METHOD_INFO['adams']['description'] + 
-                            f" ({self.METHOD_INFO['adams']['precision']})",
-                            className='method-tooltip'
-                        )
-                    ], className='method-button-container'),
+                    *[
+                        html.Div([
+                            html.Button(
+                                [f"{info['label']} ", html.I(className="fas fa-info-circle")],
+                                id=f'{method}-button',
+                                className='method-button active' if method == 'rk4' else 'method-button',
+                                n_clicks=0
+                            ),
+                            html.Span(
+                                info['description'] + f" ({info['precision']})",
+                                className='method-tooltip'
+                            )
+                        ], className='method-button-container')
+                        for method, info in self.METHOD_INFO.items()
+                    ],
                     
                     # Hidden store for current method
                     dcc.Store(id='current-method', data='rk4')
@@ -182,6 +195,11 @@ class NBodyDashboard:
                 id='run-button',
                 className='run-button'
             ),
+            html.Button(
+                'Cancel',
+                id='cancel-button',
+                className='cancel-button'
+            ),
             
             html.Div([
                 html.Label("Animation Controls:", className='control-label'),
@@ -207,7 +225,17 @@ class NBodyDashboard:
                             },
                             className='speed-slider'
                         ),
-                    ], className='speed-control')
+                    ], className='speed-control'),
+                    html.Label("Playback:", className='speed-label'),
+                    dcc.RadioItems(
+                        id='playback-mode',
+                        options=[
+                            {'label': 'Server', 'value': 'server'},
+                            {'label': 'Browser', 'value': 'client'}
+                        ],
+                        value='server',
+                        className='view-selector'
+                    ),
                 ], className='animation-controls'),
             ], className='animation-container'),
             
@@ -236,6 +264,21 @@ class NBodyDashboard:
                     dcc.Store(id='animation-frame', data=0),
                     dcc.Store(id='simulation-data'),
                     dcc.Store(id='frame-skip', data=1),  # Store frame skip value
+                    dcc.Store(id='figure-key'),  # Run and view of the animation skeleton on screen
+                    # Browser playback: decimated trajectory shipped once, animated client-side
+                    dcc.Interval(
+                        id='playback-interval',
+                        interval=100,
+                        disabled=True
+                    ),
+                    dcc.Store(id='playback-data'),
+                    dcc.Store(id='playback-frame', data=0),
+                    # Polls a background simulation job until it finishes
+                    dcc.Interval(
+                        id='job-interval',
+                        interval=1000,
+                        disabled=True
+                    ),
                 ], className='right-panel'),
             ], className='main-content'),
             
@@ -246,36 +289,63 @@ class NBodyDashboard:
             ),
         ], className='dashboard-container')
     
-    def run_simulation(self, system_name, method, sim_time, step):
-        t = np.arange(0, sim_time, step)
+    def run_simulation(self, system_name, method, sim_time, step, engine='direct',
+                       initial_state=None, output_interval=None, trajectory_path=None,
+                       precision='double', trajectory_dtype='<f8', **engine_options):
+        """
+        Integrate a system over [0, sim_time) with a fixed step.
+        engine selects the force evaluation ('direct', 'barnes-hut' or 'threaded');
+        engine_options are passed to it, e.g. theta=0.5 for Barnes–Hut.
+        initial_state overrides the system's own; an ensemble of shape (B, 6*n)
+        is advanced in one loop and gives results of shape (len(t), B, 6*n).
+        output_interval keeps one state per interval instead of every step.
+        trajectory_path streams the run to a trajectory file and returns
+        memory-mapped views of it instead of in-memory arrays; trajectory_dtype
+        '<f4' stores it in single precision at half the size.
+        precision 'mixed' computes forces in float32, see create_integrator.
+        """
         self.system = SystemData(system_name)
-        initial_state = self.system.get_initial_state()
+        if initial_state is None:
+            initial_state = self.system.get_initial_state()
         masses = self.system.get_masses()
         
-        integrators = {
-            'euler': EulerIntegrator,
-            'rk4': RK4Integrator,
-            'verlet': VerletIntegrator,
-            'adams': AdamsBashforthIntegrator
-        }
+        self.integrator = create_integrator(method, masses, step, engine, precision, **engine_options)
+        stream = simulate(self.integrator, initial_state, sim_time, output_interval)
+        if trajectory_path is not None:
+            trajectory = write_trajectory(trajectory_path, stream, self.system, method, step,
+                                          dtype=trajectory_dtype)
+            return trajectory.times, trajectory.states
+        return collect(stream)
+    
+    def setup_metrics(self):
+        """Time and size every callback response and serve /metrics in Prometheus text format."""
+        server = self.app.server
         
-        integrator = integrators[method](
-            lambda t, y: n_body_derivative(t, y, masses),
-            step
-        )
+        @server.route('/metrics')
+        def prometheus_metrics():
+            return flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
         
-        n_bodies = len(masses)
-        results = np.zeros((len(t), 6*n_bodies))
-        results[0] = initial_state
+        if not metrics.ENABLED:
+            return
         
-        for i in range(1, len(t)):
-            results[i] = integrator.step(t[i], results[i-1])
-            
-        return t, results
+        @server.before_request
+        def start_timer():
+            flask.g.metrics_start = time.perf_counter()
+        
+        @server.after_request
+        def record_callback(response):
+            if flask.request.path.endswith('_dash-update-component'):
+                output = (flask.request.get_json(silent=True) or {}).get('output', 'unknown')
+                metrics.observe('nbody_callback_seconds', time.perf_counter() - flask.g.metrics_start,
+                                output=output)
+                metrics.observe('nbody_callback_payload_bytes', response.calculate_content_length() or 0,
+                                metrics.BYTES_BUCKETS, output=output)
+            return response
     
     def setup_callbacks(self):
         @self.app.callback(
             [Output('animation-interval', 'interval'),
+             Output('playback-interval', 'interval'),
              Output('frame-skip', 'data')],
             [Input('speed-slider', 'value')]
         )
@@ -288,43 +358,112 @@ class NBodyDashboard:
                 3: (100, 4)    # ×4 speed
             }
             interval, frame_skip = speed_mappings[speed_value]
-            return interval, frame_skip
+            return interval, interval, frame_skip
+        
+        @self.app.callback(
+            Output('playback-data', 'data'),
+            [Input('simulation-data', 'data'),
+             Input('playback-mode', 'value'),
+             Input('view-type', 'value')]
+        )
+        def update_playback_data(sim_data, playback_mode, view_type):
+            run = self.runs.open(sim_data['run_id']) if sim_data else None
+            if playback_mode != 'client' or run is None:
+                return None
+            return self.create_playback_data(run, view_type)
+        
+        # Browser playback runs entirely client-side (assets/playback.js)
+        self.app.clientside_callback(
+            ClientsideFunction(namespace='nbody', function_name='togglePlayback'),
+            Output('playback-interval', 'disabled'),
+            [Input('animate-button', 'n_clicks'),
+             Input('simulation-data', 'data'),
+             Input('playback-mode', 'value')],
+            [State('playback-interval', 'disabled')]
+        )
+        
+        self.app.clientside_callback(
+            ClientsideFunction(namespace='nbody', function_name='playbackFrame'),
+            [Output('trajectory-plot', 'figure', allow_duplicate=True),
+             Output('playback-frame', 'data'),
+             Output('figure-key', 'data', allow_duplicate=True)],
+            [Input('playback-interval', 'n_intervals')],
+            [State('playback-frame', 'data'),
+             State('frame-skip', 'data'),
+             State('playback-data', 'data')],
+            prevent_initial_call=True
+        )
 
         @self.app.callback(
-            [Output('current-method', 'data'),
-             Output('euler-button', 'className'),
-             Output('rk4-button', 'className'),
-             Output('verlet-button', 'className'),
-             Output('adams-button', 'className')],
-            [Input('euler-button', 'n_clicks'),
-             Input('rk4-button', 'n_clicks'),
-             Input('verlet-button', 'n_clicks'),
-             Input('adams-button', 'n_clicks')]
+            Output('job-interval', 'disabled'),
+            [Input('simulation-data', 'data')]
+        )
+        def toggle_job_polling(sim_data):
+            return not (sim_data and sim_data.get('job'))
+        
+        @self.app.callback(
+            [Output('trajectory-plot', 'figure', allow_duplicate=True),
+             Output('simulation-status', 'children', allow_duplicate=True),
+             Output('simulation-data', 'data', allow_duplicate=True)],
+            [Input('job-interval', 'n_intervals')],
+            [State('simulation-data', 'data'),
+             State('view-type', 'value')],
+            prevent_initial_call=True
+        )
+        def poll_job(n_intervals, sim_data, view_type):
+            if not (sim_data and sim_data.get('job')):
+                return dash.no_update, dash.no_update, dash.no_update
+            
+            run_id = sim_data['run_id']
+            status = self.jobs.status(run_id)
+            run = self.runs.open(run_id)
+            if run is not None:
+                self.current_results = run.states
+                fig = self.create_figure(run, sim_data['system'], view_type)
+                message = self.completed_status_message(sim_data['method'], sim_data['sim_time'], status)
+                return fig, message, {'run_id': run_id}
+            
+            if status is None or status['status'] in FINISHED:
+                return go.Figure(layout=PLOT_LAYOUT), self.job_status_message(sim_data, status), None
+            
+            # Still running: show the frames written so far
+            partial = self.jobs.open_partial(run_id)
+            fig = dash.no_update
+            if partial is not None and len(partial) > 1:
+                fig = self.create_figure(partial, sim_data['system'], view_type)
+            return fig, self.job_status_message(sim_data, status), dash.no_update
+        
+        @self.app.callback(
+            Output('simulation-status', 'children', allow_duplicate=True),
+            [Input('cancel-button', 'n_clicks')],
+            [State('simulation-data', 'data')],
+            prevent_initial_call=True
+        )
+        def cancel_job(n_clicks, sim_data):
+            if not (sim_data and sim_data.get('job')):
+                return dash.no_update
+            self.jobs.cancel(sim_data['run_id'])
+            return html.Span("Cancelling simulation...", style={'color': '#ffaa00'})
+        
+        @self.app.callback(
+            [Output('current-method', 'data')] +
+            [Output(f'{method}-button', 'className') for method in self.METHOD_INFO],
+            [Input(f'{method}-button', 'n_clicks') for method in self.METHOD_INFO]
         )
         def update_method_selection(*args):
             ctx = dash.callback_context
             if not ctx.triggered:
-                return 'rk4', 'method-button', 'method-button active', 'method-button', 'method-button'
-            
-            button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-            method_map = {
-                'euler-button': 'euler',
-                'rk4-button': 'rk4',
-                'verlet-button': 'verlet',
-                'adams-button': 'adams'
-            }
+                selected_method = 'rk4'
+            else:
+                button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+                selected_method = button_id[:-len('-button')]
             
-            selected_method = method_map[button_id]
-            button_classes = {
-                method: 'method-button active' if method == selected_method else 'method-button'
-                for method in ['euler', 'rk4', 'verlet', 'adams']
-            }
+            button_classes = [
+                'method-button active' if method == selected_method else 'method-button'
+                for method in self.METHOD_INFO
+            ]
             
-            return (selected_method,
-                    button_classes['euler'],
-                    button_classes['rk4'],
-                    button_classes['verlet'],
-                    button_classes['adams'])
+            return [selected_method] + button_classes
 
         @self.app.callback(
             [Output('trajectory-plot', 'figure'),
@@ -332,7 +471,8 @@ class NBodyDashboard:
              Output('simulation-status', 'children'),
              Output('animation-frame', 'data'),
              Output('animation-interval', 'disabled'),
-             Output('animate-button', 'children')],
+             Output('animate-button', 'children'),
+             Output('figure-key', 'data')],
             [Input('run-button', 'n_clicks'),
              Input('animation-interval', 'n_intervals'),
              Input('animate-button', 'n_clicks'),
@@ -344,16 +484,20 @@ class NBodyDashboard:
              State('animation-frame', 'data'),
              State('simulation-data', 'data'),
              State('animation-interval', 'disabled'),
-             State('frame-skip', 'data')]
+             State('frame-skip', 'data'),
+             State('playback-mode', 'value'),
+             State('playback-interval', 'disabled'),
+             State('figure-key', 'data')]
         )
         def update_dashboard(run_clicks, n_intervals, animate_clicks, view_type,
                            system_name, method, sim_time, step, frame, sim_data, 
-                           animation_disabled, frame_skip):
+                           animation_disabled, frame_skip, playback_mode, playback_disabled,
+                           figure_key):
             
             ctx = dash.callback_context
             if not ctx.triggered:
                 empty_fig = go.Figure(layout=PLOT_LAYOUT)
-                return empty_fig, None, "", 0, True, "Play Animation"
+                return empty_fig, None, "", 0, True, "Play Animation", None
             
             trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
             
@@ -361,26 +505,35 @@ class NBodyDashboard:
             if trigger_id == 'run-button':
                 if run_clicks is None:
                     empty_fig = go.Figure(layout=PLOT_LAYOUT)
-                    return empty_fig, None, "", 0, True, "Play Animation"
+                    return empty_fig, None, "", 0, True, "Play Animation", None
                 
                 try:
-                    t, results = self.run_simulation(system_name, method, sim_time, step)
-                    self.current_results = results
+                    # Identical requests from any worker share one stored run
+                    run_id = cache_key(SystemData.data_path(system_name), method, sim_time, step,
+                                       **SystemData.key_options(system_name))
+                    run = self.runs.open(run_id)
+                    metrics.inc('nbody_runs_total', source='job' if run is None else 'cache', method=method)
+                    if run is None:
+                        # Integrate in the background; poll_job renders progress and the result
+                        self.jobs.submit(run_id, system_name, method, sim_time, step)
+                        job = {'run_id': run_id, 'job': True, 'system': system_name,
+                               'method': method, 'sim_time': sim_time}
+                        return (go.Figure(layout=PLOT_LAYOUT), job,
+                                self.job_status_message(job, self.jobs.status(run_id)),
+                                0, True, "Play Animation", None)
                     
-                    fig = self.create_figure(results, system_name, view_type)
-                    
-                    status_message = html.Div([
-                        html.Span("✓ Simulation completed successfully", style={'color': '#00ff00'}),
-                        html.Br(),
-                        html.Span(f"Method: {method.upper()}, Duration: {sim_time} days")
-                    ])
+                    self.current_results = run.states
+                    fig = self.create_figure(run, system_name, view_type)
+                    status_message = self.completed_status_message(method, sim_time,
+                                                                   self.jobs.status(run_id), cached=True)
                     
                     return (fig, 
-                           {'results': results.tolist(), 'names': [b.name for b in self.system.bodies]},
+                           {'run_id': run_id},
                            status_message,
                            0,  # Reset animation frame
                            True,  # Disable animation
-                           "Play Animation")
+                           "Play Animation",
+                           None)  # Trajectory figure, not an animation skeleton
                 
                 except Exception as e:
                     empty_fig = go.Figure(layout=PLOT_LAYOUT)
@@ -389,88 +542,173 @@ class NBodyDashboard:
                         html.Br(),
                         html.Span(str(e))
                     ])
-                    return empty_fig, None, error_message, 0, True, "Play Animation"
+                    return empty_fig, None, error_message, 0, True, "Play Animation", None
             
             # Handle Animation Play/Pause button
             elif trigger_id == 'animate-button':
                 if animate_clicks is None:
-                    return dash.no_update, dash.no_update, dash.no_update, dash.no_update, True, "Play Animation"
+                    return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, True,
+                            "Play Animation", dash.no_update)
+                
+                # In browser playback the server interval stays off; togglePlayback flips the client one
+                if playback_mode == 'client':
+                    button_text = "Pause Animation" if playback_disabled else "Play Animation"
+                    return dash.no_update, dash.no_update, dash.no_update, frame, True, button_text, dash.no_update
                 
                 new_disabled = not animation_disabled
                 button_text = "Pause Animation" if animation_disabled else "Play Animation"
-                return dash.no_update, dash.no_update, dash.no_update, frame, new_disabled, button_text
+                return (dash.no_update, dash.no_update, dash.no_update, frame, new_disabled, button_text,
+                        dash.no_update)
             
             # Handle Animation Interval or View Type change
             elif trigger_id in ['animation-interval', 'view-type']:
-                if sim_data is None:
-                    return dash.no_update, dash.no_update, dash.no_update, frame, dash.no_update, dash.no_update
-                
-                results = np.array(sim_data['results'])
-                names = sim_data['names']
+                # The store only holds the run ID; frames are read from the server-side run
+                run = self.runs.open(sim_data['run_id']) if sim_data else None
+                if run is None:
+                    return (dash.no_update, dash.no_update, dash.no_update, frame, dash.no_update,
+                            dash.no_update, dash.no_update)
                 
                 # Update frame with frame_skip
-                frame = frame + frame_skip if frame + frame_skip < len(results) else 0
+                previous_frame = frame
+                frame = frame + frame_skip if frame + frame_skip < len(run) else 0
                 
-                fig = self.create_animation_frame(results, names, frame, view_type)
-                return fig, sim_data, dash.no_update, frame, dash.no_update, dash.no_update
+                # Once the graph shows this run's animation skeleton, only send the changed arrays
+                key = f"{sim_data['run_id']}:{view_type}"
+                if key == figure_key:
+                    fig = self.create_animation_patch(run.states, run.names, frame, view_type,
+                                                      previous_frame if trigger_id == 'animation-interval' else None)
+                else:
+                    fig = self.create_animation_figure(run.states, run.names, frame, view_type)
+                return fig, dash.no_update, dash.no_update, frame, dash.no_update, dash.no_update, key
             
             return dash.no_update
 
-    def create_figure(self, results, system_name, view_type):
+    @staticmethod
+    def completed_status_message(method, sim_time, job_status=None, cached=False):
+        """Status panel of a finished run, with the job's integrator statistics if known."""
+        status_message = html.Div([
+            html.Span("✓ Simulation completed successfully", style={'color': '#00ff00'}),
+            html.Br(),
+            html.Span(f"Method: {method.upper()}, Duration: {sim_time} days")
+        ])
+        stats = (job_status or {}).get('stats', {})
+        if cached:
+            status_message.children += [html.Br(), html.Span("Served from the result cache")]
+        elif (job_status or {}).get('resumed_from'):
+            status_message.children += [
+                html.Br(),
+                html.Span(f"Extended a stored run after {job_status['resumed_from']} steps")
+            ]
+        if 'n_accepted' in stats:
+            status_message.children += [
+                html.Br(),
+                html.Span(f"Accepted steps: {stats['n_accepted']}, rejected: {stats['n_rejected']}")
+            ]
+        if 'n_force_evaluations' in stats:
+            status_message.children += [
+                html.Br(),
+                html.Span(f"Force evaluations: {stats['n_force_evaluations']}")
+            ]
+        return status_message
+    
+    @staticmethod
+    def job_status_message(job, job_status):
+        """Status panel of a queued, running, cancelled or failed job (job is its simulation-data)."""
+        if job_status is None or job_status['status'] in ('done', 'error'):
+            # A finished job without a stored run lost it to eviction
+            error = (job_status or {}).get('error', "The simulation result is no longer available")
+            return html.Div([
+                html.Span("⚠ Error in simulation", style={'color': '#ff0000'}),
+                html.Br(),
+                html.Span(error)
+            ])
+        if job_status['status'] == 'cancelled':
+            return html.Span("Simulation cancelled", style={'color': '#ffaa00'})
+        if job_status['status'] == 'queued' or not job_status['total']:
+            progress = "Waiting for a free worker..."
+        else:
+            done, total = job_status['done'], job_status['total']
+            progress = f"{done}/{total} steps ({100 * done / total:.0f}%)"
+        return html.Div([
+            html.Span("⏳ Simulation running", style={'color': '#7fafdf'}),
+            html.Br(),
+            html.Span(f"Method: {job['method'].upper()}, Duration: {job['sim_time']} days"),
+            html.Br(),
+            html.Span(progress)
+        ])
+    
+    @metrics.timed('nbody_figure_build_seconds', builder='create_figure')
+    def create_figure(self, results, system_name, view_type, frame_range=None, max_points=LOD_POINTS):
+        """
+        results is a (frames, 6*n) array for self.system, or a TrajectoryReader
+        which brings its own names and masses. frame_range=(start, stop) limits
+        the plotted frames; only those are read from a memory-mapped run.
+        Each path is downsampled to at most max_points points (None keeps all).
+        """
+        if isinstance(results, TrajectoryReader):
+            names, masses, results = results.names, results.masses, results.states
+        else:
+            names = self.system.names
+            masses = self.system.get_masses()
+        if frame_range is not None:
+            results = results[slice(*frame_range)]
+        dims = 3 if view_type == '3d' else 2
+        paths = downsample_trajectories(results, len(names), dims, max_points or len(results))
+        
         fig = go.Figure()
         
         # Define size scale based on mass (larger mass = slightly larger marker)
-        max_mass = max(body.mass for body in self.system.bodies)
-        min_mass = min(body.mass for body in self.system.bodies)
+        max_mass = masses.max()
+        min_mass = masses.min()
         
-        for i, body in enumerate(self.system.bodies):
+        for i, (name, mass) in enumerate(zip(names, masses)):
             # Calculate relative size (log scale with minimum size)
-            relative_size = max(4, 4 + 2 * np.log10((body.mass - min_mass) / (max_mass - min_mass) + 1e-10))
+            relative_size = max(4, 4 + 2 * np.log10((mass - min_mass) / (max_mass - min_mass) + 1e-10))
             
             if view_type == '3d':
                 fig.add_trace(go.Scatter3d(
-                    x=results[:, 3*i],
-                    y=results[:, 3*i+1],
-                    z=results[:, 3*i+2],
-                    name=body.name,
+                    x=paths[:, i, 0],
+                    y=paths[:, i, 1],
+                    z=paths[:, i, 2],
+                    name=name,
                     mode='lines',
                     line=dict(
                         width=1,
-                        color=f'hsl({(i * 360/len(self.system.bodies))}, 70%, 50%)'
+                        color=f'hsl({(i * 360/len(names))}, 70%, 50%)'
                     ),
                     marker=dict(
                         size=float(relative_size),  # Convert to float
                         symbol='circle',
-                        color=f'hsl({(i * 360/len(self.system.bodies))}, 70%, 50%)'
+                        color=f'hsl({(i * 360/len(names))}, 70%, 50%)'
                     ),
                     hovertemplate=(
-                        f"<b>{body.name}</b><br>" +
+                        f"<b>{name}</b><br>" +
                         "X: %{x:.3f} AU<br>" +
                         "Y: %{y:.3f} AU<br>" +
                         "Z: %{z:.3f} AU<br>" +
-                        f"Mass: {body.mass:.2e} M☉<extra></extra>"
+                        f"Mass: {mass:.2e} M☉<extra></extra>"
                     )
                 ))
             else:
                 fig.add_trace(go.Scatter(
-                    x=results[:, 3*i],
-                    y=results[:, 3*i+1],
-                    name=body.name,
+                    x=paths[:, i, 0],
+                    y=paths[:, i, 1],
+                    name=name,
                     mode='lines',
                     line=dict(
                         width=1,
-                        color=f'hsl({(i * 360/len(self.system.bodies))}, 70%, 50%)'
+                        color=f'hsl({(i * 360/len(names))}, 70%, 50%)'
                     ),
                     marker=dict(
                         size=float(relative_size),  # Convert to float
                         symbol='circle',
-                        color=f'hsl({(i * 360/len(self.system.bodies))}, 70%, 50%)'
+                        color=f'hsl({(i * 360/len(names))}, 70%, 50%)'
                     ),
                     hovertemplate=(
-                        f"<b>{body.name}</b><br>" +
+                        f"<b>{name}</b><br>" +
                         "X: %{x:.3f} AU<br>" +
                         "Y: %{y:.3f} AU<br>" +
-                        f"Mass: {body.mass:.2e} M☉<extra></extra>"
+                        f"Mass: {mass:.2e} M☉<extra></extra>"
                     )
                 ))
         
@@ -508,6 +746,7 @@ class NBodyDashboard:
         fig.update_layout(layout)
         return fig
 
+    @metrics.timed('nbody_figure_build_seconds', builder='create_animation_frame')
     def create_animation_frame(self, results, names, frame, view_type):
         fig = go.Figure()
         
@@ -629,6 +868,104 @@ class NBodyDashboard:
         fig.update_layout(layout)
         return fig
 
+    def _animation_skeleton(self, names, view_type):
+        """Animation figure without coordinates, built once per system and view type."""
+        key = (tuple(names), view_type)
+        if key not in self._skeletons:
+            empty = np.zeros((1, 6*len(names)))
+            self._skeletons[key] = self.create_animation_frame(empty, names, 0, view_type).to_plotly_json()
+        return self._skeletons[key]
+
+    @staticmethod
+    def _marker_hovertemplate_2d(name, frame):
+        return (
+            f"<b>{name}</b><br>" +
+            "X: %{x:.3f} AU<br>" +
+            "Y: %{y:.3f} AU<br>" +
+            f"Time: {frame} days<extra></extra>"
+        )
+
+    def _animation_updates(self, results, names, frame, view_type):
+        """Per-trace properties and title that change between animation frames."""
+        n_bodies = len(names)
+        axes = 'xyz' if view_type == '3d' else 'xy'
+        trail = np.asarray(results[max(0, frame-50):frame+1, :3*n_bodies])
+        current = np.asarray(results[frame, :3*n_bodies])
+        
+        updates = []
+        for i in range(n_bodies):
+            updates.append({axis: trail[:, 3*i + k].tolist() for k, axis in enumerate(axes)})
+            marker = {axis: [float(current[3*i + k])] for k, axis in enumerate(axes)}
+            if view_type != '3d':
+                marker['hovertemplate'] = self._marker_hovertemplate_2d(names[i], frame)
+            updates.append(marker)
+        return updates, f'Time: {frame} days'
+
+    @metrics.timed('nbody_figure_build_seconds', builder='create_animation_figure')
+    def create_animation_figure(self, results, names, frame, view_type):
+        """Same figure as create_animation_frame, filled into the cached skeleton."""
+        skeleton = self._animation_skeleton(names, view_type)
+        updates, title = self._animation_updates(results, names, frame, view_type)
+        return {
+            'data': [{**trace, **update} for trace, update in zip(skeleton['data'], updates)],
+            'layout': {**skeleton['layout'], 'title': {**skeleton['layout']['title'], 'text': title}}
+        }
+
+    @metrics.timed('nbody_figure_build_seconds', builder='create_animation_patch')
+    def create_animation_patch(self, results, names, frame, view_type, previous_frame=None):
+        """
+        Partial update moving an animation skeleton already on screen to frame.
+        When stepping forward from previous_frame, trails are shifted by
+        deleting their oldest points and appending the new ones.
+        """
+        n_bodies = len(names)
+        axes = 'xyz' if view_type == '3d' else 'xy'
+        patch = Patch()
+        
+        step = frame - previous_frame if previous_frame is not None else 0
+        if 0 < step <= 50:
+            removed = max(0, frame-50) - max(0, previous_frame-50)
+            added = np.asarray(results[previous_frame+1:frame+1, :3*n_bodies])
+            for i in range(n_bodies):
+                for k, axis in enumerate(axes):
+                    for _ in range(removed):
+                        del patch['data'][2*i][axis][0]
+                    patch['data'][2*i][axis].extend(added[:, 3*i + k].tolist())
+                    patch['data'][2*i+1][axis] = [float(added[-1, 3*i + k])]
+                if view_type != '3d':
+                    patch['data'][2*i+1]['hovertemplate'] = self._marker_hovertemplate_2d(names[i], frame)
+            patch['layout']['title']['text'] = f'Time: {frame} days'
+            return patch
+        
+        updates, title = self._animation_updates(results, names, frame, view_type)
+        for k, update in enumerate(updates):
+            for prop, value in update.items():
+                patch['data'][k][prop] = value
+        patch['layout']['title']['text'] = title
+        return patch
+
+    @metrics.timed('nbody_figure_build_seconds', builder='create_playback_data')
+    def create_playback_data(self, run, view_type, max_frames=PLAYBACK_FRAMES):
+        """
+        Compact, decimated copy of a run for browser playback: per-body
+        coordinate arrays of at most max_frames frames plus a figure template
+        whose traces the client fills in frame by frame.
+        """
+        stride = -(-len(run) // max_frames)
+        states = np.asarray(run.states[::stride])
+        n_bodies = len(run.names)
+        positions = states[:, :3*n_bodies].reshape(len(states), n_bodies, 3)
+        axes = 'xyz' if view_type == '3d' else 'xy'
+        
+        template = self.create_animation_frame(states, run.names, 0, view_type)
+        return {
+            'template': template.to_plotly_json(),
+            'n_frames': len(states),
+            'trail': PLAYBACK_TRAIL,
+            'times': np.round(np.asarray(run.times[::stride]), 3).tolist(),
+            **{axis: np.round(positions[:, :, k].T, 6).tolist() for k, axis in enumerate(axes)}
+        }
+
     def run_server(self, **kwargs):
         """
         Run the dashboard server with the specified configuration.
@@ -0,0 +1,50 @@
+import numpy as np
+
+LOD_POINTS = 2000  # Default per-body point budget of trajectory traces
+
+def lttb_indices(points: np.ndarray, budget: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling of many curves at once.
+    points: shape (T, B, D), B curves of T points in D dimensions
+    budget: number of points to keep per curve (first and last always kept)
+    Returns: shape (budget, B) indices into the T axis, increasing per curve
+    """
+    n_points, n_curves = points.shape[:2]
+    if budget >= n_points or budget < 3:
+        return np.repeat(np.arange(n_points)[:, None], n_curves, axis=1)
+
+    # budget - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n_points - 1, budget - 1).astype(np.int64)
+    selected = np.empty((budget, n_curves), dtype=np.int64)
+    selected[0], selected[-1] = 0, n_points - 1
+    curves = np.arange(n_curves)
+
+    previous = points[0]
+    for b in range(budget - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_hi = edges[b + 2] if b + 2 < len(edges) else n_points
+        average = points[hi:next_hi].mean(axis=0)
+
+        # Squared area of the triangle (previous, candidate, next bucket average) in any dimension
+        u = points[lo:hi] - previous
+        v = average - previous
+        uv = np.einsum('mbd,bd->mb', u, v)
+        area2 = np.einsum('mbd,mbd->mb', u, u) * np.einsum('bd,bd->b', v, v) - uv**2
+
+        best = area2.argmax(axis=0)
+        selected[b + 1] = lo + best
+        previous = points[lo + best, curves]
+
+    return selected
+
+def downsample_trajectories(results: np.ndarray, n_bodies: int, dims: int = 3,
+                            budget: int = LOD_POINTS) -> np.ndarray:
+    """
+    Shape-preserving level-of-detail copy of every body's path.
+    results: shape (T, 6*n_bodies) states, positions first
+    dims: number of position components used (3 for 3D views, 2 for 2D)
+    Returns: shape (min(T, budget), n_bodies, dims) positions
+    """
+    positions = np.asarray(results[:, :3*n_bodies]).reshape(len(results), n_bodies, 3)[:, :, :dims]
+    indices = lttb_indices(positions, budget)
+    return positions[indices, np.arange(n_bodies)]
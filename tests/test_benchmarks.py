@@ -0,0 +1,8 @@
+from benchmarks.run_benchmarks import bench_integrators
+from src.physics.simulation import INTEGRATORS
+
+def test_bench_integrators_covers_every_method():
+    results = bench_integrators('solar system', 1.0, n_steps=2)
+    assert [result['name'] for result in results] == list(INTEGRATORS)
+    for result in results:
+        assert result['metrics']['force_evaluations_per_step'] > 0, result['name']
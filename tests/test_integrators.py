@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from src.physics.simulation import create_integrator
+
+def two_body_state(separation: float) -> np.ndarray:
+    positions = np.array([[1.0, 0.0, 0.0], [1.0 + separation, 0.0, 0.0]])
+    velocities = np.array([[0.0, 0.01, 0.0], [0.0, -0.01, 0.0]])
+    return np.concatenate([positions.ravel(), velocities.ravel()])
+
+def test_dopri_raises_on_step_size_underflow():
+    masses = np.array([1.989e30, 1.989e30])
+    integrator = create_integrator('dopri', masses, 1.0)
+    with pytest.raises(RuntimeError, match="underflow"):
+        integrator.step(0.0, two_body_state(1e-9))
+
+def test_dopri_raises_on_non_finite_state():
+    masses = np.array([1.989e30, 5.972e24])
+    state = two_body_state(1.0)
+    state[0] = np.nan
+    integrator = create_integrator('dopri', masses, 1.0)
+    with pytest.raises(RuntimeError, match="not finite"):
+        integrator.step(0.0, state)
+
+@pytest.mark.parametrize('engine, options', [('barnes-hut', {'theta': 0.7}), ('threaded', {})])
+@pytest.mark.parametrize('method', ['hermite', 'wh'])
+def test_own_force_methods_reject_other_force_engines(method, engine, options):
+    with pytest.raises(ValueError, match="own direct-sum forces"):
+        create_integrator(method, np.array([1.989e30, 5.972e24]), 1.0, engine=engine, **options)
+
+def test_adams_counts_every_evaluation_and_matches_rk4_bootstrap():
+    calls = []
+    def func(t, y):
+        calls.append(t)
+        return np.concatenate([y[6:], -y[:6]])
+    adams = create_integrator('adams', np.array([1.989e30, 5.972e24]), 0.1)
+    adams.func = func
+    rk4 = create_integrator('rk4', np.array([1.989e30, 5.972e24]), 0.1)
+    rk4.func = lambda t, y: np.concatenate([y[6:], -y[:6]])
+    y = adams.step(0.0, two_body_state(1.0))
+    np.testing.assert_array_equal(y, rk4.step(0.0, two_body_state(1.0)))
+    assert len(calls) == 4
+    for k in range(1, 6):
+        y = adams.step(0.1*k, y)
+    # Three bootstrap steps of 4 evaluations, the first PECE step also
+    # evaluates f_n, later ones reuse the corrected derivative
+    assert adams.n_evaluations == len(calls) == 3*4 + 3 + 2*2
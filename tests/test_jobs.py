@@ -0,0 +1,54 @@
+import os
+import signal
+import time
+from src.data.jobs import JobManager, FINISHED
+from src.data.run_store import RunStore
+
+def wait_finished(jobs, run_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = jobs.status(run_id)
+        if status is not None and status['status'] in FINISHED:
+            return status
+        time.sleep(0.1)
+    raise AssertionError(f"job {run_id} did not finish: {jobs.status(run_id)}")
+
+def test_a_killed_job_process_is_reported_and_the_pool_recovers(tmp_path):
+    jobs = JobManager(RunStore(str(tmp_path)), max_workers=1)
+    jobs.submit('killed', 'solar system', 'rk4', 365000, 1.0)
+    deadline = time.time() + 60
+    while jobs.status('killed')['status'] != 'running' and time.time() < deadline:
+        time.sleep(0.1)
+    for process in list(jobs._pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+
+    assert wait_finished(jobs, 'killed')['status'] == 'error'
+    jobs.submit('after', 'solar system', 'rk4', 30, 1.0)
+    assert wait_finished(jobs, 'after')['status'] == 'done'
+    assert jobs.store.open('after') is not None
+
+def test_submit_rebuilds_a_pool_broken_while_idle(tmp_path):
+    jobs = JobManager(RunStore(str(tmp_path)), max_workers=1)
+    jobs.submit('first', 'solar system', 'rk4', 30, 1.0)
+    wait_finished(jobs, 'first')
+    broken = jobs._pool
+    for process in list(broken._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    time.sleep(1.0)
+
+    jobs.submit('second', 'solar system', 'rk4', 30, 1.0)
+    assert wait_finished(jobs, 'second')['status'] == 'done'
+    assert jobs._pool is not broken
+
+def test_prune_removes_old_failed_and_cancelled_records(tmp_path, monkeypatch):
+    from src.data import jobs as jobs_module
+    jobs = JobManager(RunStore(str(tmp_path)))
+    for run_id, status in [('failed', 'error'), ('stopped', 'cancelled'), ('active', 'running')]:
+        jobs_module._write_status(str(tmp_path), run_id, {'status': status})
+    open(os.path.join(tmp_path, 'orphan.cancel'), 'w').close()
+
+    jobs.prune()
+    assert len(os.listdir(tmp_path)) == 4   # Too recent to prune
+    monkeypatch.setattr(jobs_module, 'FINISHED_KEPT', -1)
+    jobs.prune()
+    assert os.listdir(tmp_path) == ['active.job']
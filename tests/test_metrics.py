@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+SCRIPT = textwrap.dedent("""
+    import os, sys
+    from src.utils import metrics
+    if sys.argv[1] == 'export':
+        metrics.start_export()
+    metrics.inc('nbody_runs_total', source='test')
+    metrics.observe('nbody_callback_seconds', 0.01, output='test')
+    if sys.argv[2] == 'killed':
+        metrics.flush()
+        os._exit(0)
+""")
+
+def run(directory, *args):
+    env = dict(os.environ, NBODY_METRICS='1', NBODY_METRICS_DIR=str(directory))
+    subprocess.run([sys.executable, '-c', SCRIPT, *args], env=env, check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def test_only_exporting_processes_are_counted_and_exited_ones_are_retired(tmp_path, monkeypatch):
+    from src.utils import metrics
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    run(tmp_path, 'export', 'exit')
+    run(tmp_path, 'export', 'killed')
+    run(tmp_path, 'script', 'exit')
+
+    text = metrics.render()
+    assert 'nbody_runs_total{source="test"} 2.0' in text
+    assert 'nbody_callback_seconds_count{output="test"} 2' in text
+    # Both exporting processes are gone: their files were folded into one
+    assert sorted(os.listdir(tmp_path)) == ['retired.json', 'retired.lock']
+    assert metrics.render() == text
@@ -0,0 +1,52 @@
+import os
+import time
+import numpy as np
+import pytest
+from src.data import jobs
+from src.data.run_store import RunStore
+from src.physics.simulation import INTEGRATORS
+
+def write(path: str, size: int, age: float = 0.0):
+    with open(path, 'wb') as file:
+        file.write(b'\0' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+def test_evict_counts_and_removes_the_partials_of_dead_jobs(tmp_path):
+    store = RunStore(str(tmp_path), max_runs=10, max_bytes=2500)
+    write(store.path('old'), 1000, age=30)
+    live = store.partial_path('live')
+    jobs._write_status(str(tmp_path), 'live', {'status': 'running', 'partial': os.path.basename(live)})
+    write(live, 1000, age=20)
+    orphan = store.partial_path('dead')
+    write(orphan, 1000, age=10)
+    write(orphan + '.ckpt', 100, age=10)
+    bare = store.partial_path('bare')
+    write(bare, 1000, age=5)
+    write(store.path('new'), 200)
+
+    store.evict()
+    # The checkpoint-less partial goes at once; then 3300 bytes are stored,
+    # and the oldest run goes before the orphan that can still resume a run
+    assert not os.path.exists(bare)
+    assert not os.path.exists(store.path('old'))
+    assert os.path.exists(orphan) and os.path.exists(live)
+
+    store.max_bytes = 1500
+    store.evict()
+    assert not os.path.exists(orphan) and not os.path.exists(orphan + '.ckpt')
+    assert os.path.exists(live) and os.path.exists(store.path('new'))
+
+@pytest.mark.parametrize('method', list(INTEGRATORS))
+def test_a_resumed_run_is_bit_identical_to_a_run_from_scratch(tmp_path, method):
+    resumed, scratch = RunStore(str(tmp_path / 'resumed')), RunStore(str(tmp_path / 'scratch'))
+    jobs.run_job(resumed.directory, 'short', resumed.partial_path('short'), 'solar system', method, 100, 1.0)
+    jobs.run_job(resumed.directory, 'long', resumed.partial_path('long'), 'solar system', method, 300, 1.0)
+    jobs.run_job(scratch.directory, 'long', scratch.partial_path('long'), 'solar system', method, 300, 1.0)
+
+    status = jobs.JobManager(resumed).status('long')
+    assert status['status'] == 'done' and status['resumed_from'] > 0
+    expected = scratch.open('long')
+    actual = resumed.open('long')
+    np.testing.assert_array_equal(actual.times, expected.times)
+    np.testing.assert_array_equal(actual.states, expected.states)
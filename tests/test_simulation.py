@@ -0,0 +1,12 @@
+import numpy as np
+import pytest
+from src.physics.simulation import total_steps
+
+@pytest.mark.parametrize('sim_time, dt, t0', [(365, 1.0, 0.0), (10, 0.1, 0.0), (1, 1/3, 0.0),
+                                              (36.5, 0.01, 1234.5), (0.5, 1.0, 0.0)])
+def test_total_steps_matches_the_arange_grid(sim_time, dt, t0):
+    assert total_steps(sim_time, dt, t0) == len(np.arange(t0, t0 + sim_time, dt)) - 1
+
+@pytest.mark.parametrize('sim_time', [0, -5.0])
+def test_total_steps_is_zero_for_an_empty_run(sim_time):
+    assert total_steps(sim_time, 1.0) == 0
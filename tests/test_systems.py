@@ -0,0 +1,27 @@
+import json
+import os
+from src.data import systems
+
+def write_meta(directory, name: str, label: str):
+    with open(os.path.join(directory, f'{name}.json'), 'w') as file:
+        json.dump({'name': name, 'label': label, 'format': 'csv', 'source': f'{name}.csv'}, file)
+
+def test_list_systems_parses_each_metadata_file_once(tmp_path, monkeypatch):
+    write_meta(tmp_path, 'a', 'A')
+    write_meta(tmp_path, 'b', 'B')
+    loads = []
+    json_load = json.load
+    monkeypatch.setattr(systems.json, 'load', lambda file: loads.append(file.name) or json_load(file))
+
+    assert list(systems.list_systems(str(tmp_path))) == ['a', 'b']
+    for _ in range(3):
+        systems.get_system('a', str(tmp_path))
+    assert len(loads) == 2
+
+    # A modified, added or removed file rebuilds the registry
+    write_meta(tmp_path, 'a', 'A, relabelled at a new length')
+    assert systems.get_system('a', str(tmp_path))['label'] == 'A, relabelled at a new length'
+    write_meta(tmp_path, 'c', 'C')
+    assert list(systems.list_systems(str(tmp_path))) == ['a', 'b', 'c']
+    os.remove(os.path.join(tmp_path, 'b.json'))
+    assert list(systems.list_systems(str(tmp_path))) == ['a', 'c']
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+from src.physics import threaded
+from src.physics.equations import pairwise_acceleration
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_scratch_is_capped_at_one_row_block(workers):
+    rng = np.random.default_rng(0)
+    positions, masses = rng.normal(0.0, 10.0, (600, 3)), rng.uniform(1e20, 1e25, 600)
+    threaded._local.buffers = {}
+    acc = threaded.threaded_acceleration(positions, masses, workers=workers, row_block=64,
+                                         tile_size=128, min_bodies=0)
+    np.testing.assert_allclose(acc, pairwise_acceleration(positions, masses), rtol=1e-12, atol=0)
+    # The pool threads keep their own buffers; the calling thread's stay within one block
+    for buffers in threaded._local.buffers.values():
+        assert buffers[1].shape[0] <= 64 and buffers[1].shape[1] <= 128
@@ -1,4 +1,9 @@
 from src.visualization.dashboard import NBodyDashboard
+from src.utils import metrics
+
+# Export metrics from this server's processes, dropping those of earlier runs.
+# gunicorn --preload imports this once, before forking the workers.
+metrics.start_export(clear=True)
 
 # Create the dashboard application
 dashboard = NBodyDashboard()